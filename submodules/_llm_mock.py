@@ -0,0 +1,70 @@
+"""Development stand-in for the Ollama server used by to_rigify.
+
+Not a submodule (no register()): only imported by
+bpy.ops.rbm.call_llm(use_mock=True), to try the streaming operator offline.
+"""
+import http.server
+import json
+import threading
+import time
+
+from .. import log
+
+# Answers /api/generate like Ollama does, but from a prepared mapping, so the
+# streaming operator can be tried offline. Entries are only returned for
+# imported bones that appear in the prompt, wrapped in chatter and a fence.
+
+class MockLLMHandler(http.server.BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        prompt = request.get("prompt", "")
+        entries = [e for e in self.server.mapping
+                   if f'"name": {json.dumps(e["imported"])}' in prompt]
+        text = ("Here's a JSON array with the mapping:\n```json\n"
+                + json.dumps(entries, indent=2) + "\n```\n")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        if not request.get("stream", True):
+            self.wfile.write(json.dumps({"response": text, "done": True}).encode())
+            return
+        step = 32
+        try:
+            for i in range(0, len(text), step):
+                chunk = {"response": text[i:i + step], "done": False}
+                self.wfile.write((json.dumps(chunk) + "\n").encode())
+                self.wfile.flush()
+                time.sleep(self.server.delay)
+            self.wfile.write((json.dumps({"response": "", "done": True}) + "\n").encode())
+        except (BrokenPipeError, ConnectionResetError):
+            log.debug("mock LLM: client went away")
+
+    def log_message(self, format, *args):
+        log.debug("mock LLM: " + format % args)
+
+
+_mock_server = None
+
+
+def start_mock_server(mapping, delay=0.005):
+    """Serve mapping on a free localhost port, returns the generate URL."""
+    global _mock_server
+    stop_mock_server()
+    _mock_server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), MockLLMHandler)
+    _mock_server.daemon_threads = True
+    _mock_server.mapping = mapping
+    _mock_server.delay = delay
+    threading.Thread(target=_mock_server.serve_forever, daemon=True).start()
+    host, port = _mock_server.server_address
+    return f"http://{host}:{port}/api/generate"
+
+
+def stop_mock_server():
+    global _mock_server
+    if _mock_server is not None:
+        _mock_server.shutdown()
+        _mock_server.server_close()
+        _mock_server = None
@@ -1,6 +1,16 @@
 from mathutils import Matrix
+from mathutils.bvhtree import BVHTree
 import bmesh
 import bpy
+import json
+import numpy as np
+import time
+from bpy.app.handlers import persistent
+from contextlib import contextmanager
+from bpy.props import BoolProperty, EnumProperty, FloatProperty, PointerProperty, StringProperty
+
+from .. import log
+
 bl_info = {
     "name": "Bone ↔ Mesh Sync via Reference Vertices",
     "author": "",
@@ -8,12 +18,16 @@ bl_info = {
     "blender": (3, 0, 0),
     "location": (
         "3D View > Object > Create reference vertices\n"
-        "3D View > Object > Update bone positions"
+        "3D View > Object > Update bone positions\n"
+        "3D View > Object > Bind bones to surface / Update bones from surface\n"
+        "3D View > Object > Batch refit variants (also headless)\n"
+        "3D View > Object / Edit Mode Mesh menu > Live Bone Follow"
     ),
     "description": (
         "Synchronize bone positions with mesh geometry using reference vertices.\n"
         "Creates reference points at bone heads and tails,\n"
-        "allowing bones to follow mesh edits."
+        "allowing bones to follow mesh edits, on demand or live.\n"
+        "Alternatively binds bones to the surface to refit them after reshaping."
     ),
     "warning": "",
     "doc_url": "",
@@ -21,6 +35,25 @@ bl_info = {
 }
 
 
+# Reference verts carry an INT attribute: 0 for regular verts, otherwise
+# 2 * bone table index + role + 1. The bone table and the indices of the
+# reference verts are stored as custom properties on the mesh.
+REF_ATTR_NAME = "bone_ref"
+REF_NAMES_PROP = "bone_ref_names"
+REF_VERTS_PROP = "bone_ref_verts"
+ROLE_HEAD = 0
+ROLE_TAIL = 1
+
+# Optional helper object holding the references instead of the character
+# mesh, linked both ways with object custom properties
+HELPER_PROP = "bone_ref_helper"
+OWNER_PROP = "bone_ref_owner"
+BIND_MOD_NAME = "BoneRefBind"
+
+# Surface binding of bone heads/tails to the nearest triangle of the mesh
+BIND_PROP = "bone_ref_bind"
+
+# Layers of the previous, string based reference format
 REF_LAYER_NAME = "bone_ref_name"
 REF_LAYER_TYPE = "bone_ref_type"  # b'HEAD' or b'TAIL'
 
@@ -64,32 +97,353 @@ def write_bmesh(mesh_obj, bm, was_editmode):
         bm.free()
 
 
-def clear_existing_refs(bm):
-    vlayer_name = bm.verts.layers.string.get(REF_LAYER_NAME)
-    vlayer_type = bm.verts.layers.string.get(REF_LAYER_TYPE)
-    if not vlayer_name or not vlayer_type:
-        return 0
-    to_delete = [v for v in bm.verts if v[vlayer_name] and v[vlayer_type]]
-    if to_delete:
-        bmesh.ops.delete(bm, geom=to_delete, context='VERTS')
-    return len(to_delete)
+def encode_refs(bone_indices, roles):
+    return bone_indices * 2 + roles + 1
+
+
+def decode_refs(codes):
+    return np.divmod(codes - 1, 2)
+
+
+def matrix_to_np(matrix):
+    return np.array(matrix, dtype=np.float64)
+
+
+def transform_points(matrix, co):
+    m = matrix_to_np(matrix)
+    return co @ m[:3, :3].T + m[:3, 3]
 
 
-def create_ref_layers(bm):
+def find_ref_bmverts(bm, me, layer):
+    """Reference BMVerts, looked up through the stored index when it is valid."""
+    bm.verts.ensure_lookup_table()
+    count = len(bm.verts)
+    indices = list(me.get(REF_VERTS_PROP, []))
+    if indices and all(i < count and bm.verts[i][layer] for i in indices):
+        return [bm.verts[i] for i in indices]
+    # indices got out of sync, e.g. verts were deleted in Edit Mode
+    log.debug("Reference vertex index outdated, scanning mesh")
+    verts = [v for v in bm.verts if v[layer]]
+    bm.verts.index_update()
+    me[REF_VERTS_PROP] = [v.index for v in verts]
+    return verts
+
+
+def clear_existing_refs(bm, me):
+    removed = 0
+
+    # previous string based format
     vlayer_name = bm.verts.layers.string.get(REF_LAYER_NAME)
     vlayer_type = bm.verts.layers.string.get(REF_LAYER_TYPE)
-    if not vlayer_name:
-        vlayer_name = bm.verts.layers.string.new(REF_LAYER_NAME)
-    if not vlayer_type:
-        vlayer_type = bm.verts.layers.string.new(REF_LAYER_TYPE)
-    return vlayer_name, vlayer_type
+    if vlayer_name and vlayer_type:
+        to_delete = [v for v in bm.verts if v[vlayer_name] and v[vlayer_type]]
+        if to_delete:
+            bmesh.ops.delete(bm, geom=to_delete, context='VERTS')
+        bm.verts.layers.string.remove(vlayer_name)
+        bm.verts.layers.string.remove(vlayer_type)
+        removed += len(to_delete)
+
+    layer = bm.verts.layers.int.get(REF_ATTR_NAME)
+    if layer:
+        to_delete = find_ref_bmverts(bm, me, layer)
+        if to_delete:
+            bmesh.ops.delete(bm, geom=to_delete, context='VERTS')
+        removed += len(to_delete)
+
+    return removed
+
+
+def has_ref_verts(me):
+    """Whether the mesh holds reference verts, of either format."""
+    if me.attributes.get(REF_LAYER_NAME):
+        return True
+    attr = me.attributes.get(REF_ATTR_NAME)
+    if not attr:
+        return False
+    codes = np.empty(len(me.vertices), dtype=np.int32)
+    attr.data.foreach_get('value', codes)
+    return bool(codes.any())
+
+
+def append_ref_verts(me, codes, co):
+    """Append one loose vertex per reference in Object Mode and return their
+    indices. Coordinates and codes are written in bulk."""
+    start = len(me.vertices)
+    if me.shape_keys:
+        # shape keys can't grow through the Python API, BMesh extends them
+        bm = bmesh.new()
+        bm.from_mesh(me)
+        layer = bm.verts.layers.int.get(REF_ATTR_NAME) or bm.verts.layers.int.new(REF_ATTR_NAME)
+        for point, code in zip(co.tolist(), codes.tolist()):
+            bm.verts.new(point)[layer] = code
+        bm.to_mesh(me)
+        bm.free()
+    else:
+        me.vertices.add(len(codes))
+        all_co = np.empty(len(me.vertices) * 3, dtype=np.float32)
+        me.vertices.foreach_get('co', all_co)
+        all_co[start * 3:] = co.astype(np.float32).ravel()
+        me.vertices.foreach_set('co', all_co)
+
+        attr = me.attributes.get(REF_ATTR_NAME)
+        if not attr:
+            attr = me.attributes.new(REF_ATTR_NAME, 'INT', 'POINT')
+        values = np.empty(len(me.vertices), dtype=np.int32)
+        attr.data.foreach_get('value', values)
+        values[start:] = codes
+        attr.data.foreach_set('value', values)
+    me.update()
+    return list(range(start, start + len(codes)))
+
+
+def bone_ref_points(arm_obj, mesh_obj):
+    """Mesh space rest positions of all bone tails and unconnected heads.
+
+    Returns the bone name table, the reference codes and the coordinates.
+    """
+    bones = arm_obj.data.bones
+    n = len(bones)
+    heads = np.empty(n * 3, dtype=np.float32)
+    tails = np.empty(n * 3, dtype=np.float32)
+    connected = np.empty(n, dtype=bool)
+    bones.foreach_get('head_local', heads)
+    bones.foreach_get('tail_local', tails)
+    bones.foreach_get('use_connect', connected)
+
+    # connected heads follow the parent's tail
+    loose = np.flatnonzero(~connected)
+    bone_indices = np.concatenate((np.arange(n), loose))
+    roles = np.concatenate((np.full(n, ROLE_TAIL), np.full(len(loose), ROLE_HEAD)))
+    co = np.concatenate((tails.reshape(-1, 3), heads.reshape(-1, 3)[loose]))
+
+    to_mesh = mesh_obj.matrix_world.inverted() @ arm_obj.matrix_world
+    return [b.name for b in bones], encode_refs(bone_indices, roles), transform_points(to_mesh, co)
+
+
+def read_refs(mesh_obj, depsgraph=None):
+    """Bone name table, reference codes and mesh space coordinates of the
+    reference verts, or None if the mesh has none.
+
+    With a depsgraph, coordinates are read from the evaluated mesh."""
+    me = mesh_obj.data
+    names = list(me.get(REF_NAMES_PROP, []))
+    if not names:
+        return None
+
+    if mesh_obj.mode == 'EDIT':
+        bm = bmesh.from_edit_mesh(me)
+        layer = bm.verts.layers.int.get(REF_ATTR_NAME)
+        if not layer:
+            return None
+        verts = find_ref_bmverts(bm, me, layer)
+        codes = np.array([v[layer] for v in verts], dtype=np.int64)
+        co = np.array([v.co[:] for v in verts], dtype=np.float64).reshape(-1, 3)
+        return names, codes, co
+
+    attr = me.attributes.get(REF_ATTR_NAME)
+    if not attr:
+        return None
+    n = len(me.vertices)
+
+    # Only the stored reference verts are read, so the cost follows the
+    # bone count; the whole attribute is scanned only if they are stale
+    indices = [int(i) for i in me.get(REF_VERTS_PROP, [])]
+    codes = None
+    if indices and max(indices) < n:
+        codes = [attr.data[i].value for i in indices]
+        if not all(codes):
+            codes = None
+    if codes is None:
+        log.debug("Reference vertex index outdated, rebuilding it")
+        all_codes = np.empty(n, dtype=np.int32)
+        attr.data.foreach_get('value', all_codes)
+        indices = np.flatnonzero(all_codes).tolist()
+        codes = all_codes[indices]
+        me[REF_VERTS_PROP] = indices
+
+    if depsgraph:
+        me = mesh_obj.evaluated_get(depsgraph).data
+    verts = me.vertices
+    co = np.array([verts[i].co[:] for i in indices], dtype=np.float64).reshape(-1, 3)
+    return names, np.asarray(codes, dtype=np.int64), co
+
+
+def mesh_coords(me):
+    co = np.empty(len(me.vertices) * 3, dtype=np.float32)
+    me.vertices.foreach_get('co', co)
+    return co.reshape(-1, 3).astype(np.float64)
+
+
+def mesh_triangles(me):
+    me.calc_loop_triangles()
+    tris = np.empty(len(me.loop_triangles) * 3, dtype=np.int32)
+    me.loop_triangles.foreach_get('vertices', tris)
+    return tris.reshape(-1, 3)
+
+
+def triangle_frames(co, tri_verts):
+    """Corner positions and unit normals of the given triangles."""
+    a, b, c = (co[tri_verts[:, i]] for i in range(3))
+    normals = np.cross(b - a, c - a)
+    normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+    return a, b, c, normals
+
 
+def bind_points_to_surface(co, tris, points):
+    """Bind points to their nearest triangle.
 
-def add_ref_vertex(bm, co_mesh_space, bone_name_bytes, role_bytes, vlayer_name, vlayer_type):
-    v = bm.verts.new(co_mesh_space)
-    v[vlayer_name] = bone_name_bytes
-    v[vlayer_type] = role_bytes
-    return v
+    Returns the triangle's vertex indices, the barycentric coordinates of the
+    point projected onto the triangle plane and the signed offset along the
+    triangle normal, so surface_points() reproduces the points exactly on the
+    undeformed mesh.
+    """
+    bvh = BVHTree.FromPolygons(co.tolist(), tris.tolist(), all_triangles=True)
+    nearest = np.array([bvh.find_nearest(p)[2] for p in points.tolist()], dtype=np.int64)
+    tri_verts = tris[nearest]
+
+    a, b, c, normals = triangle_frames(co, tri_verts)
+    offset = np.einsum('ij,ij->i', points - a, normals)
+    projected = points - offset[:, None] * normals
+
+    v0, v1, v2 = b - a, c - a, projected - a
+    d00 = np.einsum('ij,ij->i', v0, v0)
+    d01 = np.einsum('ij,ij->i', v0, v1)
+    d11 = np.einsum('ij,ij->i', v1, v1)
+    d20 = np.einsum('ij,ij->i', v2, v0)
+    d21 = np.einsum('ij,ij->i', v2, v1)
+    denom = np.maximum(d00 * d11 - d01 * d01, 1e-20)
+    v = (d11 * d20 - d01 * d21) / denom
+    w = (d00 * d21 - d01 * d20) / denom
+    bary = np.stack((1.0 - v - w, v, w), axis=1)
+    return tri_verts, bary, offset
+
+
+def surface_points(co, tri_verts, bary, offset):
+    """Re-project bound points onto the (deformed) triangles, all at once."""
+    a, b, c, normals = triangle_frames(co, tri_verts)
+    return (bary[:, 0:1] * a + bary[:, 1:2] * b + bary[:, 2:3] * c
+            + offset[:, None] * normals)
+
+
+def idprop_array(value, dtype):
+    return np.array(value.to_list() if hasattr(value, "to_list") else value, dtype=dtype)
+
+
+def write_surface_binding(me, names, codes, tri_verts, bary, offset):
+    me[BIND_PROP] = {
+        "names": names,
+        "codes": codes.tolist(),
+        "verts": tri_verts.ravel().tolist(),
+        "bary": bary.ravel().tolist(),
+        "offset": offset.tolist(),
+        "vertex_count": len(me.vertices),
+    }
+
+
+def read_surface_binding(me):
+    """(names, codes, triangle verts, barycentric coords, offsets) or None."""
+    bind = me.get(BIND_PROP)
+    if not bind:
+        return None
+    return (
+        list(bind["names"]),
+        idprop_array(bind["codes"], np.int64),
+        idprop_array(bind["verts"], np.int64).reshape(-1, 3),
+        idprop_array(bind["bary"], np.float64).reshape(-1, 3),
+        idprop_array(bind["offset"], np.float64),
+    )
+
+
+def get_ref_objects(obj):
+    """Object holding the references and the armature, for a character mesh
+    or for its reference helper object."""
+    owner = obj.get(OWNER_PROP)
+    if owner is not None:
+        return obj, get_armature_from_mesh(owner)
+    helper = obj.get(HELPER_PROP)
+    return (helper if helper is not None else obj), get_armature_from_mesh(obj)
+
+
+@contextmanager
+def rest_position(context, arm_obj):
+    """Evaluate the scene with the armature in its rest position."""
+    prev = arm_obj.data.pose_position
+    if prev != 'REST':
+        arm_obj.data.pose_position = 'REST'
+        context.view_layer.update()
+    try:
+        yield
+    finally:
+        if prev != 'REST':
+            arm_obj.data.pose_position = prev
+            context.view_layer.update()
+
+
+def ensure_helper(mesh_obj):
+    helper = mesh_obj.get(HELPER_PROP)
+    if helper is not None:
+        return helper
+
+    me = bpy.data.meshes.new(mesh_obj.name + "_bone_refs")
+    helper = bpy.data.objects.new(me.name, me)
+    for coll in mesh_obj.users_collection:
+        coll.objects.link(helper)
+    # identity parenting: helper space == character mesh space
+    helper.parent = mesh_obj
+    helper.show_in_front = True
+    helper[OWNER_PROP] = mesh_obj
+    mesh_obj[HELPER_PROP] = helper
+    return helper
+
+
+def remove_helper(mesh_obj):
+    helper = mesh_obj.get(HELPER_PROP)
+    if helper is None:
+        return
+    del mesh_obj[HELPER_PROP]
+    me = helper.data
+    bpy.data.objects.remove(helper)
+    if not me.users:
+        bpy.data.meshes.remove(me)
+
+
+def write_helper_refs(helper, names, codes, co):
+    """Replace the helper geometry by one loose vertex per reference."""
+    me = helper.data
+    me.clear_geometry()
+    me.vertices.add(len(codes))
+    me.vertices.foreach_set('co', co.astype(np.float32).ravel())
+    attr = me.attributes.get(REF_ATTR_NAME)
+    if not attr:
+        attr = me.attributes.new(REF_ATTR_NAME, 'INT', 'POINT')
+    attr.data.foreach_set('value', codes.astype(np.int32))
+    me[REF_NAMES_PROP] = names
+    me[REF_VERTS_PROP] = list(range(len(codes)))
+    me.update()
+
+
+def bind_helper(context, helper, mesh_obj):
+    """(Re)bind the helper to the character surface with Surface Deform."""
+    mod = helper.modifiers.get(BIND_MOD_NAME)
+    if not mod:
+        mod = helper.modifiers.new(BIND_MOD_NAME, 'SURFACE_DEFORM')
+    mod.target = mesh_obj
+    with context.temp_override(object=helper, active_object=helper):
+        if mod.is_bound:
+            # the operator toggles, first call unbinds
+            bpy.ops.object.surfacedeform_bind(modifier=mod.name)
+        bpy.ops.object.surfacedeform_bind(modifier=mod.name)
+    # binding happens on evaluation
+    context.view_layer.update()
+
+
+def read_ref_source(context, ref_obj, arm_obj):
+    """read_refs() for either storage; helper positions follow the bound
+    surface, evaluated in rest position."""
+    if ref_obj.get(OWNER_PROP) is None or ref_obj.mode == 'EDIT':
+        return read_refs(ref_obj)
+    with rest_position(context, arm_obj):
+        return read_refs(ref_obj, context.evaluated_depsgraph_get())
 
 
 def get_mode(obj):
@@ -108,16 +462,77 @@ def switch_mode(mode):
         bpy.ops.object.mode_set(mode=mode, toggle=False)
 
 
+def apply_refs_to_bones(context, mesh_obj, arm_obj, refs):
+    """Move the armature's edit bones onto the reference positions.
+
+    Temporarily makes the armature active in Edit Mode and restores the
+    previous active object, selection and mode afterwards.
+    """
+    names, codes, co = refs
+
+    # Mesh space -> armature space for all references at once
+    to_arm = arm_obj.matrix_world.inverted() @ mesh_obj.matrix_world
+    co = transform_points(to_arm, co)
+    bone_indices, roles = decode_refs(codes)
+
+    # Switch to Armature Edit Mode and apply positions
+    prev_active = context.view_layer.objects.active
+    prev_mode = get_mode(prev_active)
+    prev_selected = list(context.selected_objects)
+    # Leave the current mode first, so its edits are kept
+    if prev_mode and prev_mode != 'OBJECT':
+        switch_mode('OBJECT')
+    # Ensure armature is active
+    for obj in prev_selected:
+        obj.select_set(False)
+    set_active(context, arm_obj)
+
+    try:
+        switch_mode('EDIT')
+        edit_bones = arm_obj.data.edit_bones
+
+        for bone_index, role, point in zip(bone_indices.tolist(), roles.tolist(), co.tolist()):
+            eb = edit_bones.get(names[bone_index])
+            if not eb:
+                continue
+            if role == ROLE_HEAD:
+                eb.head = point
+            else:
+                eb.tail = point
+
+    finally:
+        # Restore previous active object, selection and mode
+        switch_mode('OBJECT')
+        arm_obj.select_set(False)
+        for obj in prev_selected:
+            obj.select_set(True)
+        context.view_layer.objects.active = prev_active
+        if prev_mode and prev_mode != 'OBJECT':
+            switch_mode(prev_mode)
+
+
 class BONE_SYNC_OT_create_refs(bpy.types.Operator):
     bl_idname = "bone_sync.create_reference_vertices"
     bl_label = "Create reference vertices"
     bl_options = {'REGISTER', 'UNDO'}
 
+    use_helper: BoolProperty(
+        name="Separate Helper Object",
+        description=(
+            "Store the references in a small helper mesh bound to the character "
+            "with a Surface Deform modifier, instead of adding vertices to the character mesh"
+        ),
+        default=False
+    )
+
     def execute(self, context):
         mesh_obj = get_active_mesh_object(context)
         if not mesh_obj:
             self.report({'ERROR'}, "Select one mesh object.")
             return {'CANCELLED'}
+        if mesh_obj.get(OWNER_PROP) is not None:
+            # helper is active, work on its character
+            mesh_obj = mesh_obj[OWNER_PROP]
 
         arm_obj = get_armature_from_mesh(mesh_obj)
         if not arm_obj:
@@ -125,34 +540,51 @@ class BONE_SYNC_OT_create_refs(bpy.types.Operator):
                 {'ERROR'}, "No Armature modifier found on the selected mesh.")
             return {'CANCELLED'}
 
-        # Prepare bmesh
-        bm, was_editmode = ensure_bmesh(mesh_obj, for_write=True)
+        me = mesh_obj.data
+        names, codes, co = bone_ref_points(arm_obj, mesh_obj)
 
-        # Remove existing reference vertices
-        removed = clear_existing_refs(bm)
+        if self.use_helper:
+            removed = 0
+            if REF_NAMES_PROP in me:
+                # move existing references out of the character mesh
+                bm, was_editmode = ensure_bmesh(mesh_obj, for_write=True)
+                removed = clear_existing_refs(bm, me)
+                write_bmesh(mesh_obj, bm, was_editmode)
+                for key in (REF_NAMES_PROP, REF_VERTS_PROP):
+                    if key in me:
+                        del me[key]
 
-        vlayer_name, vlayer_type = create_ref_layers(bm)
+            helper = ensure_helper(mesh_obj)
+            write_helper_refs(helper, names, codes, co)
+            with rest_position(context, arm_obj):
+                bind_helper(context, helper, mesh_obj)
 
-        # Create vertices at bone tails and optionally heads
-        mw_mesh_inv = mesh_obj.matrix_world.inverted()
-        mw_arm = arm_obj.matrix_world
+            self.report(
+                {'INFO'}, f"Reference helper '{helper.name}' created. Removed {removed} refs from the mesh.")
+            return {'FINISHED'}
 
-        # Use rest pose positions from Armature data bones
-        for bone in arm_obj.data.bones:
-            # Tail
-            world_tail = mw_arm @ bone.tail_local
-            mesh_tail = mw_mesh_inv @ world_tail
-            add_ref_vertex(bm, mesh_tail, bone.name.encode(
-                'utf-8'), b"TAIL", vlayer_name, vlayer_type)
+        remove_helper(mesh_obj)
 
-            # Head if not connected to parent
-            if not bone.use_connect:
-                world_head = mw_arm @ bone.head_local
-                mesh_head = mw_mesh_inv @ world_head
-                add_ref_vertex(bm, mesh_head, bone.name.encode(
-                    'utf-8'), b"HEAD", vlayer_name, vlayer_type)
+        # bulk writes need Object Mode, leaving Edit Mode flushes its edits
+        was_editmode = mesh_obj.mode == 'EDIT'
+        if was_editmode:
+            switch_mode('OBJECT')
+        try:
+            # Remove existing reference vertices, the Mesh API can't delete
+            removed = 0
+            if has_ref_verts(me):
+                bm, _ = ensure_bmesh(mesh_obj, for_write=True)
+                removed = clear_existing_refs(bm, me)
+                write_bmesh(mesh_obj, bm, False)
 
-        write_bmesh(mesh_obj, bm, was_editmode)
+            # Create vertices at bone tails and unconnected heads
+            ref_indices = append_ref_verts(me, codes, co)
+        finally:
+            if was_editmode:
+                switch_mode('EDIT')
+
+        me[REF_NAMES_PROP] = names
+        me[REF_VERTS_PROP] = ref_indices
 
         self.report(
             {'INFO'}, f"Reference vertices created. Removed {removed} old refs.")
@@ -170,99 +602,498 @@ class BONE_SYNC_OT_update_bones(bpy.types.Operator):
             self.report({'ERROR'}, "Select one mesh object.")
             return {'CANCELLED'}
 
-        arm_obj = get_armature_from_mesh(mesh_obj)
+        ref_obj, arm_obj = get_ref_objects(mesh_obj)
         if not arm_obj:
             self.report(
                 {'ERROR'}, "No Armature modifier found on the selected mesh.")
             return {'CANCELLED'}
 
-        # Read reference vertices from mesh
-        bm, was_editmode = ensure_bmesh(mesh_obj, for_write=False)
-        vlayer_name = bm.verts.layers.string.get(REF_LAYER_NAME)
-        vlayer_type = bm.verts.layers.string.get(REF_LAYER_TYPE)
-        if not vlayer_name or not vlayer_type:
-            if not was_editmode:
-                bm.free()
+        # Read reference vertices from mesh or helper object
+        refs = read_ref_source(context, ref_obj, arm_obj)
+        if refs is None:
             self.report(
                 {'ERROR'}, "No reference layers found. Run 'Create reference vertices' first.")
             return {'CANCELLED'}
 
-        # Build mapping: { bone_name: {"HEAD": world_co, "TAIL": world_co} }
-        refs = {}
-        mw_mesh = mesh_obj.matrix_world
-        for v in bm.verts:
-            name_b = v[vlayer_name]
-            type_b = v[vlayer_type]
-            if not name_b or not type_b:
-                continue
-            bone_name = name_b.decode('utf-8', errors='ignore')
-            role = type_b.decode('utf-8', errors='ignore')
-            world_co = mw_mesh @ v.co
-            refs.setdefault(bone_name, {})[role] = world_co
+        if not len(refs[1]):
+            self.report({'ERROR'}, "No reference vertices found on the mesh.")
+            return {'CANCELLED'}
 
-        if not was_editmode:
-            bm.free()
+        apply_refs_to_bones(context, ref_obj, arm_obj, refs)
 
-        if not refs:
-            self.report({'ERROR'}, "No reference vertices found on the mesh.")
+        self.report(
+            {'INFO'}, "Bone positions updated from reference vertices.")
+        return {'FINISHED'}
+
+
+def deformed_mesh_coords(context, mesh_obj, arm_obj):
+    """Vertex coordinates with shape keys and deforming modifiers applied,
+    evaluated with the armature in rest position."""
+    if mesh_obj.mode == 'EDIT':
+        mesh_obj.update_from_editmode()
+    me = mesh_obj.data
+    with rest_position(context, arm_obj):
+        eval_me = mesh_obj.evaluated_get(context.evaluated_depsgraph_get()).data
+        if len(eval_me.vertices) == len(me.vertices):
+            return mesh_coords(eval_me)
+    # generative modifiers change the vertex layout, use the base mesh
+    return mesh_coords(me)
+
+
+class BONE_SYNC_OT_bind_surface(bpy.types.Operator):
+    """Bind bone heads and tails to the nearest triangles of the mesh surface"""
+    bl_idname = "bone_sync.bind_to_surface"
+    bl_label = "Bind bones to surface"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        mesh_obj = get_active_mesh_object(context)
+        if not mesh_obj:
+            self.report({'ERROR'}, "Select one mesh object.")
+            return {'CANCELLED'}
+        if mesh_obj.get(OWNER_PROP) is not None:
+            mesh_obj = mesh_obj[OWNER_PROP]
+
+        arm_obj = get_armature_from_mesh(mesh_obj)
+        if not arm_obj:
+            self.report(
+                {'ERROR'}, "No Armature modifier found on the selected mesh.")
             return {'CANCELLED'}
 
-        # Switch to Armature Edit Mode and apply positions
-        prev_active = context.view_layer.objects.active
-        prev_mode = get_mode(prev_active)
-        # Ensure armature is active
-        for obj in context.selected_objects:
-            obj.select_set(False)
-        set_active(context, arm_obj)
+        me = mesh_obj.data
+        co = deformed_mesh_coords(context, mesh_obj, arm_obj)
+        tris = mesh_triangles(me)
+        if not len(tris):
+            self.report({'ERROR'}, "Mesh has no faces to bind to.")
+            return {'CANCELLED'}
 
-        try:
-            switch_mode('EDIT')
-            arm_inv = arm_obj.matrix_world.inverted()
-
-            for eb in arm_obj.data.edit_bones:
-                data = refs.get(eb.name)
-                if not data:
-                    continue
-                if "HEAD" in data:
-                    eb.head = arm_inv @ data["HEAD"]
-                if "TAIL" in data:
-                    eb.tail = arm_inv @ data["TAIL"]
+        names, codes, points = bone_ref_points(arm_obj, mesh_obj)
+        tri_verts, bary, offset = bind_points_to_surface(co, tris, points)
+        write_surface_binding(me, names, codes, tri_verts, bary, offset)
 
-        finally:
-            # Restore previous selection and mode
-            for obj in context.scene.objects:
-                obj.select_set(False)
-            if prev_active:
-                set_active(context, prev_active)
-            if prev_mode:
-                switch_mode(prev_mode)
+        self.report({'INFO'}, f"Bound {len(codes)} bone points to the surface.")
+        return {'FINISHED'}
 
-        self.report(
-            {'INFO'}, "Bone positions updated from reference vertices.")
+
+class BONE_SYNC_OT_update_from_surface(bpy.types.Operator):
+    """Move bones onto the re-projected surface binding of the current mesh shape"""
+    bl_idname = "bone_sync.update_from_surface"
+    bl_label = "Update bones from surface"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        mesh_obj = get_active_mesh_object(context)
+        if not mesh_obj:
+            self.report({'ERROR'}, "Select one mesh object.")
+            return {'CANCELLED'}
+        if mesh_obj.get(OWNER_PROP) is not None:
+            mesh_obj = mesh_obj[OWNER_PROP]
+
+        arm_obj = get_armature_from_mesh(mesh_obj)
+        if not arm_obj:
+            self.report(
+                {'ERROR'}, "No Armature modifier found on the selected mesh.")
+            return {'CANCELLED'}
+
+        me = mesh_obj.data
+        binding = read_surface_binding(me)
+        if binding is None:
+            self.report(
+                {'ERROR'}, "No surface binding found. Run 'Bind bones to surface' first.")
+            return {'CANCELLED'}
+        if me[BIND_PROP].get("vertex_count") != len(me.vertices):
+            self.report(
+                {'ERROR'}, "Mesh topology changed since binding. Bind again.")
+            return {'CANCELLED'}
+
+        names, codes, tri_verts, bary, offset = binding
+        co = deformed_mesh_coords(context, mesh_obj, arm_obj)
+        points = surface_points(co, tri_verts, bary, offset)
+        apply_refs_to_bones(context, mesh_obj, arm_obj, (names, codes, points))
+
+        self.report({'INFO'}, "Bone positions updated from surface binding.")
+        return {'FINISHED'}
+
+
+def bone_rest_arrays(arm_obj, names, codes, points):
+    """Armature space head/tail arrays of all bones, with the reference points
+    (already in armature space) applied and connected heads following their
+    parent's tail."""
+    bones = arm_obj.data.bones
+    n = len(bones)
+    heads = np.empty(n * 3, dtype=np.float32)
+    tails = np.empty(n * 3, dtype=np.float32)
+    connected = np.empty(n, dtype=bool)
+    bones.foreach_get('head_local', heads)
+    bones.foreach_get('tail_local', tails)
+    bones.foreach_get('use_connect', connected)
+    heads = heads.reshape(-1, 3).astype(np.float64)
+    tails = tails.reshape(-1, 3).astype(np.float64)
+
+    bone_names = [b.name for b in bones]
+    index = {name: i for i, name in enumerate(bone_names)}
+    parents = np.array([index[b.parent.name] if b.parent else -1 for b in bones], dtype=np.int64)
+
+    bone_indices, roles = decode_refs(codes)
+    targets = np.array([index.get(names[i], -1) for i in bone_indices.tolist()], dtype=np.int64)
+    for role, arr in ((ROLE_HEAD, heads), (ROLE_TAIL, tails)):
+        sel = (targets >= 0) & (roles == role)
+        arr[targets[sel]] = points[sel]
+
+    linked = np.flatnonzero(connected & (parents >= 0))
+    heads[linked] = tails[parents[linked]]
+    return bone_names, heads, tails
+
+
+def write_variant_armature(context, arm_obj, name, matrix_world, bone_names, heads, tails):
+    """Copy of the armature with the given rest positions."""
+    new_arm = arm_obj.copy()
+    new_arm.data = arm_obj.data.copy()
+    new_arm.name = new_arm.data.name = name
+    new_arm.matrix_world = matrix_world
+    new_arm.animation_data_clear()
+    context.scene.collection.objects.link(new_arm)
+
+    with context.temp_override(active_object=new_arm, object=new_arm, selected_objects=[new_arm]):
+        bpy.ops.object.mode_set(mode='EDIT')
+        edit_bones = new_arm.data.edit_bones
+        index = {n: i for i, n in enumerate(bone_names)}
+        order = np.array([index[eb.name] for eb in edit_bones], dtype=np.int64)
+        edit_bones.foreach_set('head', heads[order].astype(np.float32).ravel())
+        edit_bones.foreach_set('tail', tails[order].astype(np.float32).ravel())
+        bpy.ops.object.mode_set(mode='OBJECT')
+    return new_arm
+
+
+class BONE_SYNC_OT_batch_refit(bpy.types.Operator):
+    """Compute bone rest positions for meshes sharing the base mesh topology"""
+    bl_idname = "bone_sync.batch_refit"
+    bl_label = "Batch refit variants"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    base_object: StringProperty(
+        name="Base Mesh",
+        description="Mesh with surface binding or reference vertices, active object if empty",
+        default=""
+    )
+    variant_collection: StringProperty(
+        name="Variant Collection",
+        description="Collection with the variant meshes, selected meshes if empty",
+        default=""
+    )
+    source: EnumProperty(
+        name="Source",
+        items=[
+            ('AUTO', "Auto", "Surface binding if present, else reference vertices"),
+            ('SURFACE', "Surface Binding", "Re-project the surface binding onto each variant"),
+            ('REFERENCES', "Reference Vertices", "Use the variants' reference vertex positions"),
+        ],
+        default='AUTO'
+    )
+    output: EnumProperty(
+        name="Output",
+        items=[
+            ('ARMATURE', "Armatures", "Create one armature per variant"),
+            ('NPZ', "NPZ", "Write head/tail arrays per variant to a NumPy .npz file"),
+            ('JSON', "JSON", "Write head/tail arrays per variant to a JSON file"),
+        ],
+        default='ARMATURE'
+    )
+    filepath: StringProperty(
+        name="File Path",
+        description="Output file for NPZ/JSON output",
+        subtype='FILE_PATH',
+        default="//bone_refit.npz"
+    )
+
+    def execute(self, context):
+        base_obj = bpy.data.objects.get(self.base_object) if self.base_object else context.active_object
+        if not base_obj or base_obj.type != 'MESH':
+            self.report({'ERROR'}, "No base mesh object.")
+            return {'CANCELLED'}
+        if base_obj.get(OWNER_PROP) is not None:
+            base_obj = base_obj[OWNER_PROP]
+        ref_obj, arm_obj = get_ref_objects(base_obj)
+        if not arm_obj:
+            self.report({'ERROR'}, "No Armature modifier found on the base mesh.")
+            return {'CANCELLED'}
+
+        if self.variant_collection:
+            coll = bpy.data.collections.get(self.variant_collection)
+            if not coll:
+                self.report({'ERROR'}, f"Collection '{self.variant_collection}' not found.")
+                return {'CANCELLED'}
+            variants = [o for o in coll.all_objects if o.type == 'MESH' and o != base_obj]
+        else:
+            variants = [o for o in context.selected_objects if o.type == 'MESH' and o != base_obj]
+        if not variants:
+            self.report({'ERROR'}, "No variant meshes given.")
+            return {'CANCELLED'}
+
+        # per variant: mesh coordinates -> (names, codes, mesh space points)
+        base_me = base_obj.data
+        binding = read_surface_binding(base_me) if self.source != 'REFERENCES' else None
+        refs = None
+        if not binding and self.source != 'SURFACE':
+            refs = read_ref_source(context, ref_obj, arm_obj)
+        if binding:
+            names, codes, tri_verts, bary, offset = binding
+
+            def variant_points(co):
+                return surface_points(co, tri_verts, bary, offset)
+        elif refs is not None and len(refs[1]) and ref_obj == base_obj:
+            names, codes, _ = refs
+            # read_refs() keeps the stored index valid
+            indices = idprop_array(base_me[REF_VERTS_PROP], np.int64)
+
+            def variant_points(co):
+                return co[indices]
+        elif refs is not None and len(refs[1]):
+            # helper verts are not part of the variants, carry them over
+            # through the base surface like a surface binding
+            names, codes, points = refs
+            tris = mesh_triangles(base_me)
+            if not len(tris):
+                self.report({'ERROR'}, "Base mesh has no faces to bind the helper references to.")
+                return {'CANCELLED'}
+            tri_verts, bary, offset = bind_points_to_surface(
+                deformed_mesh_coords(context, base_obj, arm_obj), tris, points)
+
+            def variant_points(co):
+                return surface_points(co, tri_verts, bary, offset)
+        else:
+            self.report({'ERROR'}, "Base mesh has no surface binding or reference vertices.")
+            return {'CANCELLED'}
+
+        # variants share the base mesh space
+        to_arm = arm_obj.matrix_world.inverted() @ base_obj.matrix_world
+        vertex_count = len(base_me.vertices)
+        results = {}
+        timings = {}
+        skipped = {}  # variant name -> its vertex count
+        bone_names = []
+        for variant in variants:
+            start = time.perf_counter()
+            co = mesh_coords(variant.data)
+            if len(co) != vertex_count:
+                log.warning(f"'{variant.name}' has {len(co)} vertices, the base mesh {vertex_count}, skipped")
+                skipped[variant.name] = len(co)
+                continue
+            points = transform_points(to_arm, variant_points(co))
+            bone_names, heads, tails = bone_rest_arrays(arm_obj, names, codes, points)
+
+            if self.output == 'ARMATURE':
+                matrix = variant.matrix_world @ base_obj.matrix_world.inverted() @ arm_obj.matrix_world
+                write_variant_armature(
+                    context, arm_obj, f"{arm_obj.name}_{variant.name}", matrix, bone_names, heads, tails)
+            results[variant.name] = (heads, tails)
+            timings[variant.name] = (time.perf_counter() - start) * 1000.0
+            log.info(f"Refit '{variant.name}': {timings[variant.name]:.1f} ms")
+
+        # timings and skipped variants go into the file too, for headless runs
+        if self.output != 'ARMATURE' and (results or skipped):
+            path = bpy.path.abspath(self.filepath)
+            if self.output == 'NPZ':
+                arrays = {
+                    "bone_names": np.array(bone_names),
+                    "base_vertex_count": np.array(vertex_count),
+                    "skipped_names": np.array(list(skipped), dtype=str),
+                    "skipped_vertex_counts": np.array(list(skipped.values()), dtype=np.int64),
+                }
+                for name, (heads, tails) in results.items():
+                    arrays[f"{name}/head"] = heads
+                    arrays[f"{name}/tail"] = tails
+                    arrays[f"{name}/time_ms"] = np.array(timings[name])
+                np.savez(bpy.path.ensure_ext(path, ".npz"), **arrays)
+            else:
+                data = {
+                    "bone_names": bone_names,
+                    "base_vertex_count": vertex_count,
+                    "variants": {
+                        name: {"head": heads.tolist(), "tail": tails.tolist(),
+                               "time_ms": timings[name]}
+                        for name, (heads, tails) in results.items()
+                    },
+                    "skipped": skipped,
+                }
+                with open(bpy.path.ensure_ext(path, ".json"), "w") as f:
+                    json.dump(data, f)
+
+        msg = f"Refit {len(results)} variants in {sum(timings.values()):.1f} ms"
+        if timings:
+            msg += f" (slowest {max(timings.values()):.1f} ms)"
+        if skipped:
+            msg += f", skipped {len(skipped)} with another vertex count: {', '.join(skipped)}"
+        self.report({'WARNING'} if skipped else {'INFO'}, msg)
         return {'FINISHED'}
 
 
+# Live follow: a timer polls the reference verts of the active mesh through
+# the stored index only, and moves the bones once the references stopped
+# changing for 'live_delay' seconds. Rest bones can only be moved in Armature
+# Edit Mode, so an update briefly leaves the current mode and restores the
+# active object, selection and mode afterwards. Object and mesh Edit Mode
+# are followed; other modes wait until the user is back in one of them.
+LIVE_INTERVAL = 0.25
+LIVE_MODES = {'OBJECT', 'EDIT_MESH'}
+_live_state = {"applied": {}, "seen": None, "changed_at": 0.0}
+
+
+def ref_fingerprint(mesh_obj, depsgraph):
+    """Coordinates of the indexed reference verts as bytes, or None. Helper
+    objects are read evaluated, Surface Deform only moves those."""
+    me = mesh_obj.data
+    indices = me.get(REF_VERTS_PROP)
+    if not indices:
+        return None
+    if mesh_obj.mode == 'EDIT':
+        verts = bmesh.from_edit_mesh(me).verts
+        verts.ensure_lookup_table()
+    elif mesh_obj.get(OWNER_PROP) is not None:
+        verts = mesh_obj.evaluated_get(depsgraph).data.vertices
+    else:
+        verts = me.vertices
+    count = len(verts)
+    return np.array(
+        [verts[i].co[:] for i in indices if i < count], dtype=np.float32).tobytes()
+
+
+def modal_running(context):
+    return any(getattr(w, "modal_operators", None) for w in context.window_manager.windows)
+
+
+def live_follow_tick():
+    context = bpy.context
+    props = context.scene.bone_sync_props
+    if not props.live_follow:
+        return None
+
+    try:
+        if context.mode not in LIVE_MODES:
+            return LIVE_INTERVAL
+        active = context.view_layer.objects.active
+        if not active or active.type != 'MESH':
+            return LIVE_INTERVAL
+        mesh_obj, arm_obj = get_ref_objects(active)
+        fingerprint = ref_fingerprint(mesh_obj, context.evaluated_depsgraph_get())
+        if not arm_obj or fingerprint is None:
+            return LIVE_INTERVAL
+
+        applied = _live_state["applied"]
+        if mesh_obj.name not in applied:
+            # first time we see this mesh, take its state as the current one
+            applied[mesh_obj.name] = fingerprint
+        if fingerprint == applied[mesh_obj.name]:
+            return LIVE_INTERVAL
+
+        now = time.monotonic()
+        if fingerprint != _live_state["seen"]:
+            _live_state["seen"] = fingerprint
+            _live_state["changed_at"] = now
+            return LIVE_INTERVAL
+        if (now - _live_state["changed_at"] < props.live_delay or modal_running(context)
+                or context.screen and context.screen.is_animation_playing):
+            return LIVE_INTERVAL
+
+        refs = read_ref_source(context, mesh_obj, arm_obj)
+        if refs is not None and len(refs[1]):
+            window = context.window_manager.windows[0]
+            with context.temp_override(window=window, screen=window.screen):
+                apply_refs_to_bones(bpy.context, mesh_obj, arm_obj, refs)
+            log.debug(f"Live follow updated bones of '{arm_obj.name}'")
+        applied[mesh_obj.name] = fingerprint
+    except Exception:
+        log.error("Live bone follow failed", exc_info=True)
+    return LIVE_INTERVAL
+
+
+def set_live_follow(enabled):
+    if enabled:
+        _live_state.update(applied={}, seen=None, changed_at=0.0)
+        if not bpy.app.timers.is_registered(live_follow_tick):
+            bpy.app.timers.register(
+                live_follow_tick, first_interval=LIVE_INTERVAL, persistent=True)
+    elif bpy.app.timers.is_registered(live_follow_tick):
+        bpy.app.timers.unregister(live_follow_tick)
+
+
+def live_follow_changed(self, context):
+    set_live_follow(self.live_follow)
+
+
+@persistent
+def live_follow_load_post(_dummy):
+    """Follow the live setting of the loaded file."""
+    scene = bpy.context.scene
+    set_live_follow(bool(scene and scene.bone_sync_props.live_follow))
+
+
+class PG_BoneSyncProperties(bpy.types.PropertyGroup):
+    """Bone Sync's properties."""
+    live_follow: BoolProperty(
+        name="Live Bone Follow",
+        description=(
+            "Move the bones whenever the reference vertices of the active mesh were moved. "
+            "Works in Object and mesh Edit Mode; each update briefly enters Armature Edit Mode "
+            "and restores the active object, selection and mode"
+        ),
+        default=False,
+        update=live_follow_changed
+    )
+    live_delay: FloatProperty(
+        name="Live Follow Delay",
+        description="Seconds the reference vertices must stay unchanged before bones are updated",
+        default=0.5,
+        min=0.0,
+        soft_max=5.0,
+        subtype='TIME_ABSOLUTE'
+    )
+
+
 def draw_bone_sync_menu(self, context):
     layout = self.layout
     layout.separator()
     layout.operator(BONE_SYNC_OT_create_refs.bl_idname, icon='MESH_DATA')
     layout.operator(BONE_SYNC_OT_update_bones.bl_idname, icon='ARMATURE_DATA')
+    layout.operator(BONE_SYNC_OT_bind_surface.bl_idname, icon='SURFACE_DATA')
+    layout.operator(BONE_SYNC_OT_update_from_surface.bl_idname, icon='BONE_DATA')
+    layout.operator(BONE_SYNC_OT_batch_refit.bl_idname, icon='OUTLINER_OB_ARMATURE')
+    layout.prop(context.scene.bone_sync_props, "live_follow")
+
+
+def draw_bone_sync_edit_menu(self, context):
+    layout = self.layout
+    layout.separator()
+    layout.prop(context.scene.bone_sync_props, "live_follow")
 
 
 classes = (
+    PG_BoneSyncProperties,
     BONE_SYNC_OT_create_refs,
     BONE_SYNC_OT_update_bones,
+    BONE_SYNC_OT_bind_surface,
+    BONE_SYNC_OT_update_from_surface,
+    BONE_SYNC_OT_batch_refit,
 )
 
 
 def register():
     for cls in classes:
         bpy.utils.register_class(cls)
+    bpy.types.Scene.bone_sync_props = PointerProperty(type=PG_BoneSyncProperties)
     bpy.types.VIEW3D_MT_object.append(draw_bone_sync_menu)
+    bpy.types.VIEW3D_MT_edit_mesh.append(draw_bone_sync_edit_menu)
+    bpy.app.handlers.load_post.append(live_follow_load_post)
 
 
 def unregister():
+    if live_follow_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(live_follow_load_post)
+    set_live_follow(False)
+
+    bpy.types.VIEW3D_MT_edit_mesh.remove(draw_bone_sync_edit_menu)
     bpy.types.VIEW3D_MT_object.remove(draw_bone_sync_menu)
+    del bpy.types.Scene.bone_sync_props
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
 
@@ -1,6 +1,8 @@
 import bmesh
 import bpy
-from mathutils.kdtree import KDTree
+import hashlib
+import numpy as np
+from contextlib import contextmanager
 
 bl_info = {
     "name": "Mesh Edit Utilities",
@@ -11,14 +13,21 @@ bl_info = {
         "3D View > Edit Mode (Mesh) > Vertex Menu\n"
         " - Zero X Selected Vertices\n"
         " - Center Selected X in Edit Mode\n"
+        " - Build Mirror Map\n"
         "3D View > Edit Mode (Mesh) > Merge Menu\n"
         " - Merge by Distance Preview"
     ),
     "description": (
         "Adds mesh editing tools in Edit Mode:\n"
-        "• Zero X Selected Vertices – set X coordinate of selected verts to 0\n"
-        "• Center Selected X – center selection along local X axis\n"
-        "• Merge by Distance Preview – highlight verts within merge threshold"
+        "• Zero X Selected Vertices – set X coordinate of selected verts to 0,\n"
+        "  or of all verts within a tolerance of the center\n"
+        "• Center Selected X – move the mesh so the selection is centered on\n"
+        "  local X, optionally with all shape keys\n"
+        "• Build Mirror Map – store each vertex's X-mirror partner as an\n"
+        "  attribute and select unpaired verts\n"
+        "• Merge by Distance Preview – highlight verts within merge threshold,\n"
+        "  reporting the weld clusters; all, selected or boundary verts,\n"
+        "  or across selected objects; optional distance sweep with a plot"
     ),
     "warning": "",
     "doc_url": "",
@@ -26,32 +35,448 @@ bl_info = {
 }
 
 
+@contextmanager
+def object_mode_data(obj):
+    """Mesh data of an Edit Mode object with the edits flushed to it, for
+    bulk foreach_get/foreach_set. Back in Edit Mode afterwards."""
+    bpy.ops.object.mode_set(mode='OBJECT')
+    try:
+        yield obj.data
+    finally:
+        bpy.ops.object.mode_set(mode='EDIT')
+
+
+def read_flags(collection, attr="select"):
+    flags = np.empty(len(collection), dtype=bool)
+    collection.foreach_get(attr, flags)
+    return flags
+
+
+def read_coords(obj):
+    """(n, 3) local coordinates as Edit Mode shows them: the active shape
+    key's, else the vertices'."""
+    key = obj.active_shape_key
+    data = key.data if key else obj.data.vertices
+    co = np.empty(len(data) * 3, dtype=np.float32)
+    data.foreach_get("co", co)
+    return co.reshape(-1, 3)
+
+
+def dependent_keys(keys, key_block):
+    """Keys relative to key_block, directly or through other keys."""
+    if not keys.use_relative:
+        return []
+    found = []
+    names = {key_block.name}
+    while names:
+        new = [kb for kb in keys.key_blocks
+               if kb.relative_key.name in names and kb != key_block and kb not in found]
+        found += new
+        names = {kb.name for kb in new}
+    return found
+
+
+def write_coords(obj, co):
+    """Write (n, 3) coordinates back where read_coords() got them. The mesh
+    vertices follow the reference key, and keys relative to the written key
+    get the same offsets, as leaving Edit Mode would give them."""
+    me = obj.data
+    key = obj.active_shape_key
+    flat = co.astype(np.float32).ravel()
+    if key:
+        offset = flat - read_coords(obj).ravel()
+        key.data.foreach_set("co", flat)
+        for kb in dependent_keys(me.shape_keys, key):
+            dep = np.empty(len(flat), dtype=np.float32)
+            kb.data.foreach_get("co", dep)
+            kb.data.foreach_set("co", dep + offset)
+    if key is None or key == me.shape_keys.reference_key:
+        me.vertices.foreach_set("co", flat)
+    me.update()
+
+
 class MESH_OT_zero_x_selected(bpy.types.Operator):
     bl_idname = "mesh.zero_x_selected"
     bl_label = "Zero X Selected Vertices"
     bl_options = {'REGISTER', 'UNDO'}
 
+    mode: bpy.props.EnumProperty(
+        name="Mode",
+        items=[
+            ('SELECTED', "Selected", "Set X of the selected vertices to 0"),
+            ('NEAR_CENTER', "Snap Near Center",
+             "Set X to 0 on all vertices of the mesh closer to the center than the tolerance"),
+        ],
+        default='SELECTED'
+    )
+    tolerance: bpy.props.FloatProperty(
+        name="Tolerance",
+        default=0.0001,
+        min=0.0,
+        precision=5,
+        subtype='DISTANCE',
+        description="Snap vertices with |X| below this distance"
+    )
+
     @classmethod
     def poll(cls, context):
         obj = context.active_object
         return obj and obj.type == 'MESH' and context.mode == 'EDIT_MESH'
 
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(self, "mode", expand=True)
+        if self.mode == 'NEAR_CENTER':
+            layout.prop(self, "tolerance")
+
     def execute(self, context):
         obj = context.edit_object
-        me = obj.data
-        bm = bmesh.from_edit_mesh(me)
-        count = 0
-
-        for v in bm.verts:
-            if v.select:
-                v.co.x = 0.0
-                count += 1
 
-        bmesh.update_edit_mesh(me, destructive=False)
-        self.report({'INFO'}, f"Zeroed X on {count} verts")
+        with object_mode_data(obj) as me:
+            co = read_coords(obj)
+            if self.mode == 'SELECTED':
+                mask = read_flags(me.vertices)
+            else:
+                # pre-symmetrize cleanup: only verts that are off center
+                x = np.abs(co[:, 0])
+                mask = (x < self.tolerance) & (x > 0.0)
+            count = int(np.count_nonzero(mask))
+            if count:
+                co[mask, 0] = 0.0
+                write_coords(obj, co)
+
+        if self.mode == 'SELECTED':
+            self.report({'INFO'}, f"Zeroed X on {count} verts")
+        else:
+            self.report({'INFO'}, f"Snapped {count} verts within {self.tolerance:.6f} of X = 0")
         return {'FINISHED'}
     
 
+# Grid hash for distance queries: points are sorted by the key of their cell,
+# cells are at least the query radius wide, so a pair can only be in the
+# same or in adjacent cells.
+
+NEIGHBORS = np.array(
+    [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)],
+    dtype=np.int64)
+# forward half of the neighbourhood, each cell pair visited once
+HALF_NEIGHBORS = NEIGHBORS[13:]
+GRID_MAX_CELLS = 1 << 20
+GRID_HEADROOM = 1.25
+PAIR_BATCH = 1 << 22
+
+
+def candidate_batches(counts, starts):
+    """(rows, slots) pairing every row r with the slots starts[r] ..
+    starts[r] + counts[r] - 1, in batches of about PAIR_BATCH pairs."""
+    rows = np.flatnonzero(counts)
+    if not len(rows):
+        return
+    ends = np.cumsum(counts[rows])
+    cuts = np.unique(np.searchsorted(ends, np.arange(PAIR_BATCH, ends[-1], PAIR_BATCH)))
+    for batch in np.split(rows, cuts):
+        if not len(batch):
+            continue
+        c = counts[batch]
+        r = np.repeat(batch, c)
+        first = np.repeat(np.cumsum(c) - c, c)
+        yield r, np.repeat(starts[batch], c) + np.arange(len(r)) - first
+
+
+def no_pairs():
+    empty = np.empty(0, dtype=np.int64)
+    return empty, empty, np.empty(0)
+
+
+class VertexGrid:
+    """Vertex coordinates sorted into a grid hash with cells of edge >= size."""
+
+    def __init__(self, co, size):
+        self.co = co
+        self.radius = size
+        co = np.asarray(co, dtype=np.float64)
+        self.low = co.min(axis=0) if len(co) else np.zeros(3)
+        extent = float((co.max(axis=0) - self.low).max()) if len(co) else 0.0
+        # at most GRID_MAX_CELLS per axis so the keys fit in int64; larger
+        # cells only add candidates
+        self.size = max(size * GRID_HEADROOM, extent / GRID_MAX_CELLS) or 1.0
+        cells = self.cells(co)
+        # one empty cell of padding on each side keeps neighbour keys in range
+        self.dims = cells.max(axis=0) + 2 if len(co) else np.ones(3, dtype=np.int64)
+        self.strides = np.array(
+            [self.dims[1] * self.dims[2], self.dims[2], 1], dtype=np.int64)
+        key = cells @ self.strides
+        self.order = np.argsort(key, kind='stable')
+        self.sorted_co = co[self.order]
+        self.keys, self.starts, self.counts = np.unique(
+            key[self.order], return_index=True, return_counts=True)
+        self.cell_of = np.repeat(np.arange(len(self.keys)), self.counts)
+
+    def cells(self, co):
+        return np.floor((co - self.low) / self.size).astype(np.int64) + 1
+
+    def fits(self, co, radius):
+        """Whether the grid indexes co and suits queries of radius."""
+        return (self.radius / 2 <= radius <= self.size and self.co.shape == co.shape
+                and np.array_equal(self.co, co))
+
+    def lookup(self, cells):
+        """Index into keys of each cell, -1 where the cell is empty."""
+        valid = ((cells >= 0) & (cells < self.dims)).all(axis=1)
+        key = cells @ self.strides
+        found = np.searchsorted(self.keys, key)
+        found[found == len(self.keys)] = 0
+        return np.where(valid & (self.keys[found] == key), found, -1)
+
+    def pairs(self, radius, mask=None):
+        """All vertex pairs (i, j), i < j, within radius, with their
+        distances. With mask, only pairs of masked vertices."""
+        if not len(self.keys):
+            return no_pairs()
+        sorted_mask = mask[self.order] if mask is not None else None
+        cell_coords = np.stack(np.unravel_index(self.keys, self.dims), axis=1)
+        found_i, found_j, found_d = [], [], []
+        for offset in HALF_NEIGHBORS:
+            neighbor = self.lookup(cell_coords + offset)[self.cell_of]
+            counts = np.where(neighbor >= 0, self.counts[neighbor], 0)
+            if sorted_mask is not None:
+                counts[~sorted_mask] = 0
+            self_cell = not offset.any()
+            for p, q in candidate_batches(counts, self.starts[neighbor]):
+                keep = q > p if self_cell else np.ones(len(p), dtype=bool)
+                if sorted_mask is not None:
+                    keep &= sorted_mask[q]
+                p, q = p[keep], q[keep]
+                d2 = ((self.sorted_co[p] - self.sorted_co[q]) ** 2).sum(axis=1)
+                keep = d2 <= radius * radius
+                found_i.append(p[keep])
+                found_j.append(q[keep])
+                found_d.append(d2[keep])
+        if not found_i:
+            return no_pairs()
+        i = self.order[np.concatenate(found_i)]
+        j = self.order[np.concatenate(found_j)]
+        return np.minimum(i, j), np.maximum(i, j), np.sqrt(np.concatenate(found_d))
+
+    def query(self, points, radius):
+        """Pairs (point, vertex) of other points within radius of the
+        indexed vertices, with their distances."""
+        if not len(self.keys) or not len(points):
+            return no_pairs()
+        points = np.asarray(points, dtype=np.float64)
+        cells = self.cells(points)
+        found_i, found_j, found_d = [], [], []
+        for offset in NEIGHBORS:
+            neighbor = self.lookup(cells + offset)
+            counts = np.where(neighbor >= 0, self.counts[neighbor], 0)
+            for p, q in candidate_batches(counts, self.starts[neighbor]):
+                d2 = ((points[p] - self.sorted_co[q]) ** 2).sum(axis=1)
+                keep = d2 <= radius * radius
+                found_i.append(p[keep])
+                found_j.append(q[keep])
+                found_d.append(d2[keep])
+        if not found_i:
+            return no_pairs()
+        return (np.concatenate(found_i), self.order[np.concatenate(found_j)],
+                np.sqrt(np.concatenate(found_d)))
+
+
+# One grid per object and space, reused while the coordinates are unchanged,
+# so redoing with another distance only re-queries.
+_grid_cache = {}
+GRID_CACHE_SIZE = 8
+
+
+def get_vertex_grid(obj, co, radius, world=False):
+    key = (obj.as_pointer(), world)
+    grid = _grid_cache.pop(key, None)
+    if grid is None or not grid.fits(co, radius):
+        grid = VertexGrid(co, radius)
+    _grid_cache[key] = grid
+    while len(_grid_cache) > GRID_CACHE_SIZE:
+        _grid_cache.pop(next(iter(_grid_cache)))
+    return grid
+
+
+def cluster_labels(n, i, j):
+    """Connected components of the pairs: per vertex the lowest vertex index
+    of its cluster."""
+    labels = np.arange(n)
+    # work on the paired vertices only, in compact indices
+    nodes, inverse = np.unique(np.concatenate((i, j)), return_inverse=True)
+    a, b = np.split(inverse, 2)
+    root = np.arange(len(nodes))
+    while True:
+        ra, rb = root[a], root[b]
+        high, low = np.maximum(ra, rb), np.minimum(ra, rb)
+        linked = high != low
+        if not linked.any():
+            break
+        # hook the higher root under the lower one, then flatten the trees
+        np.minimum.at(root, high[linked], low[linked])
+        while True:
+            up = root[root]
+            if np.array_equal(up, root):
+                break
+            root = up
+    labels[nodes] = nodes[root]
+    return labels
+
+
+def forest_pairs(n, i, j):
+    """Mask of the pairs that join two clusters when the pairs are added in
+    order, as union-find would grow them. Boruvka rounds with the pair
+    order as weight build the same forest, without a Python loop per pair."""
+    m = len(i)
+    forest = np.zeros(m, dtype=bool)
+    root = np.arange(n)
+    live = np.arange(m)
+    while len(live):
+        ri, rj = root[i[live]], root[j[live]]
+        keep = ri != rj
+        live, ri, rj = live[keep], ri[keep], rj[keep]
+        if not len(live):
+            break
+        # every cluster takes its first pair to another cluster
+        first = np.full(n, m)
+        np.minimum.at(first, ri, live)
+        np.minimum.at(first, rj, live)
+        chosen = np.unique(first[first < m])
+        forest[chosen] = True
+        root = cluster_labels(n, root[i[chosen]], root[j[chosen]])[root]
+    return forest
+
+
+class PairSweep:
+    """Vertex pairs up to max_radius in ascending distance, with the merged
+    vertex and cluster counts after each pair. Any distance up to max_radius
+    is a prefix of the pairs."""
+
+    def __init__(self, n, i, j, d, max_radius, grids=(), masks=()):
+        order = np.argsort(d, kind='stable')
+        self.i, self.j, self.d = i[order], j[order], d[order]
+        self.max_radius = max_radius
+        # what the pairs were found in, see fits()
+        self.grids = list(grids)
+        self.masks = list(masks)
+        m = len(self.d)
+
+        # distance at which each vertex first gets a partner
+        first = np.full(n, m)
+        np.minimum.at(first, self.i, np.arange(m))
+        np.minimum.at(first, self.j, np.arange(m))
+        self.first_distance = np.append(self.d, np.inf)[first]
+
+        # after k pairs: merged[k] verts in clusters[k] clusters
+        new_verts = np.bincount(first[first < m], minlength=m)
+        self.merged = np.concatenate(([0], np.cumsum(new_verts)))
+        joins = np.cumsum(forest_pairs(n, self.i, self.j))
+        self.clusters = self.merged - np.concatenate(([0], joins))
+
+    def fits(self, grids, masks, radius):
+        """Whether the pairs came from these grids and masks and reach radius."""
+        return (radius <= self.max_radius and len(grids) == len(self.grids)
+                and all(g is own for g, own in zip(grids, self.grids))
+                and all((m is None and own is None)
+                        or (m is not None and own is not None and np.array_equal(m, own))
+                        for m, own in zip(masks, self.masks)))
+
+    def prefix(self, radius):
+        return int(np.searchsorted(self.d, radius, side='right'))
+
+    def counts(self, radius):
+        """(merged verts, clusters) within radius."""
+        k = self.prefix(radius)
+        return int(self.merged[k]), int(self.clusters[k])
+
+    def selection(self, radius):
+        return self.first_distance <= radius
+
+    def curve(self, steps):
+        """[(radius, merged verts)] at steps even distances up to max_radius."""
+        radii = np.linspace(self.max_radius / steps, self.max_radius, steps)
+        merged = self.merged[np.searchsorted(self.d, radii, side='right')]
+        return list(zip(radii.tolist(), merged.tolist()))
+
+
+# The last sweep, reused by redo while its objects, scope and masks are unchanged
+_sweep_cache = {}
+SWEEP_PLOT_ROWS = 10
+SWEEP_PLOT_WIDTH = 24
+
+
+def sweep_key(objects, scope):
+    return tuple(o.as_pointer() for o in objects), scope
+
+
+def non_manifold_verts(me):
+    """Mask of the vertices on boundary, wire or non-manifold edges, of
+    loose vertices, and of vertices where separate face fans meet (bow-ties)."""
+    edges = np.empty(len(me.edges) * 2, dtype=np.int64)
+    me.edges.foreach_get("vertices", edges)
+    edges.shape = (-1, 2)
+    loop_edges = np.empty(len(me.loops), dtype=np.int64)
+    me.loops.foreach_get("edge_index", loop_edges)
+    faces_per_edge = np.bincount(loop_edges, minlength=len(me.edges))
+
+    mask = np.ones(len(me.vertices), dtype=bool)
+    mask[edges.ravel()] = False
+    mask[edges[faces_per_edge != 2].ravel()] = True
+    mask[fan_verts(me, loop_edges)] = True
+    return mask
+
+
+def fan_verts(me, loop_edges):
+    """Indices of the vertices whose faces form more than one fan, i.e.
+    face corners that are not connected through the vertex's edges."""
+    nl = len(me.loops)
+    loop_verts = np.empty(nl, dtype=np.int64)
+    me.loops.foreach_get("vertex_index", loop_verts)
+    starts = np.empty(len(me.polygons), dtype=np.int64)
+    me.polygons.foreach_get("loop_start", starts)
+    totals = np.empty(len(me.polygons), dtype=np.int64)
+    me.polygons.foreach_get("loop_total", totals)
+
+    # a corner touches the edge leaving it and the edge of the previous corner
+    prev = np.arange(nl) - 1
+    prev[starts] = starts + totals - 1
+    corners = np.concatenate((np.arange(nl), np.arange(nl)))
+    keys = np.concatenate((loop_verts, loop_verts)) * len(me.edges) \
+        + np.concatenate((loop_edges, loop_edges[prev]))
+    order = np.argsort(keys, kind='stable')
+    keys, corners = keys[order], corners[order]
+    shared = keys[1:] == keys[:-1]
+    fans = cluster_labels(nl, corners[:-1][shared], corners[1:][shared])
+
+    # distinct fans per vertex
+    pairs = np.unique(np.stack((loop_verts, fans), axis=1), axis=0)
+    counts = np.bincount(pairs[:, 0], minlength=len(me.vertices))
+    return np.flatnonzero(counts > 1)
+
+
+def world_coords(obj, co):
+    matrix = np.array(obj.matrix_world, dtype=np.float64)
+    return co @ matrix[:3, :3].T + matrix[:3, 3]
+
+
+def write_vertex_selection(me, mask):
+    """Select exactly the vertices in mask, in Object Mode."""
+    me.vertices.foreach_set("select", mask)
+    me.edges.foreach_set("select", np.zeros(len(me.edges), dtype=bool))
+    me.polygons.foreach_set("select", np.zeros(len(me.polygons), dtype=bool))
+
+
+def cluster_summary(sizes, largest_listed=4):
+    """'120×2, 8×3, 1×>4' from the sizes of the clusters."""
+    counts = np.bincount(sizes)
+    parts = [f"{counts[s]}×{s}" for s in range(2, min(len(counts), largest_listed + 1))
+             if counts[s]]
+    larger = int(counts[largest_listed + 1:].sum())
+    if larger:
+        parts.append(f"{larger}×>{largest_listed}")
+    return ", ".join(parts)
+
+
 class MESH_OT_merge_by_distance_preview(bpy.types.Operator):
     bl_idname = "mesh.merge_by_distance_preview"
     bl_label = "Preview Merge by Distance"
@@ -65,54 +490,178 @@ class MESH_OT_merge_by_distance_preview(bpy.types.Operator):
         precision=4,
         description="Max distance for merging"
     )
+    scope: bpy.props.EnumProperty(
+        name="Scope",
+        items=[
+            ('ALL', "All", "Pairs of any vertices of the mesh"),
+            ('SELECTED', "Selected", "Pairs of selected vertices only"),
+            ('BOUNDARY', "Boundary",
+             "Pairs of boundary and non-manifold vertices only, for welding seams"),
+            ('OBJECTS', "Across Objects",
+             "Pairs between different selected mesh objects, in world space"),
+        ],
+        default='ALL'
+    )
+    sweep: bpy.props.BoolProperty(
+        name="Sweep",
+        default=False,
+        description="Find all pairs up to Max Distance once, so changing Distance "
+                    "only takes a prefix of them. Shows merged verts per distance"
+    )
+    max_distance: bpy.props.FloatProperty(
+        name="Max Distance",
+        default=0.01,
+        min=0.0,
+        precision=4,
+        description="Largest distance of the sweep"
+    )
 
     @classmethod
     def poll(cls, context):
         obj = context.active_object
         return obj and obj.type == 'MESH' and context.mode == 'EDIT_MESH'
 
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(self, "threshold")
+        layout.prop(self, "scope")
+        layout.prop(self, "sweep")
+        if not self.sweep:
+            return
+        layout.prop(self, "max_distance")
+
+        # verts merged vs distance, to pick the knee
+        sweep = _sweep_cache.get(sweep_key(self.scope_objects(context), self.scope))
+        if sweep is None:
+            return
+        curve = sweep.curve(SWEEP_PLOT_ROWS)
+        peak = max(curve[-1][1], 1)
+        col = layout.column(align=True)
+        col.label(text="Merged verts by distance:")
+        low = 0.0
+        for radius, merged in curve:
+            mark = "▶" if low < self.threshold <= radius else "   "
+            bar = "█" * round(SWEEP_PLOT_WIDTH * merged / peak)
+            col.label(text=f"{mark} {radius:.4f}  {bar} {merged}")
+            low = radius
+
+    def scope_objects(self, context):
+        obj = context.edit_object
+        if self.scope != 'OBJECTS':
+            return [obj]
+        return [obj] + [o for o in context.selected_objects
+                        if o.type == 'MESH' and o is not obj]
+
     def execute(self, context):
         obj = context.edit_object
-        me = obj.data
-        bm = bmesh.from_edit_mesh(me)
-        
-        # ensure the verts list uses stable indices
-        bm.verts.ensure_lookup_table()
-
-        # Build KD-Tree of all verts
-        size = len(bm.verts)
-        kd = KDTree(size)
-        for i, v in enumerate(bm.verts):
-            kd.insert(v.co, i)
-        kd.balance()
-
-        # Find all verts with neighbors within threshold
-        to_select = set()
-        for i, v in enumerate(bm.verts):
-            hits = kd.find_range(v.co, self.threshold)
-            if len(hits) > 1:
-                for co, idx, dist in hits:
-                    to_select.add(idx)
-
-        # Deselect all, then select only the affected verts
-        for v in bm.verts:
-            v.select = False
-        for idx in to_select:
-            bm.verts[idx].select = True
-
-        bmesh.update_edit_mesh(me)
+        objects = self.scope_objects(context)
+        if self.scope == 'OBJECTS' and len(objects) < 2:
+            self.report({'WARNING'}, "Select at least two mesh objects")
+            return {'CANCELLED'}
+
+        with object_mode_data(obj):
+            radius = max(self.threshold, self.max_distance) if self.sweep else self.threshold
+            grids, coords, masks = self.gather(objects, radius)
+            counts = [len(co) for co in coords]
+            summary = ""
+
+            if self.sweep:
+                # all pairs up to the max distance, the distance is a prefix
+                key = sweep_key(objects, self.scope)
+                sweep = _sweep_cache.get(key)
+                if sweep is None or not sweep.fits(grids, masks, radius):
+                    sweep = PairSweep(sum(counts), *self.find_pairs(grids, coords, masks, radius),
+                                      radius, grids, masks)
+                    _sweep_cache.clear()
+                    _sweep_cache[key] = sweep
+                to_select = sweep.selection(self.threshold)
+                merged, clusters = sweep.counts(self.threshold)
+            else:
+                # Pairs within threshold, grouped into weld clusters
+                i, j, _ = self.find_pairs(grids, coords, masks, radius)
+                labels = cluster_labels(sum(counts), i, j)
+                sizes = np.bincount(labels)
+                to_select = sizes[labels] > 1
+                merged = int(to_select.sum())
+                sizes = sizes[sizes > 1]
+                clusters = len(sizes)
+                if clusters:
+                    summary = (f" (sizes {cluster_summary(sizes)}, "
+                               f"largest {int(sizes.max())})")
+
+            # Select only the verts that have a partner
+            for o, mask in zip(objects, np.split(to_select, np.cumsum(counts)[:-1])):
+                write_vertex_selection(o.data, mask)
+
+        for o in objects:
+            if o.mode == 'EDIT':
+                bm = bmesh.from_edit_mesh(o.data)
+                bm.select_flush_mode()
+                bmesh.update_edit_mesh(o.data, loop_triangles=False, destructive=False)
+
+        if not clusters:
+            self.report({'INFO'}, f"No vertices within {self.threshold:.6f}")
+            return {'FINISHED'}
         self.report(
             {'INFO'},
-            f"Marked {len(to_select)} vertices within {self.threshold:.6f}"
+            f"Marked {merged} vertices in {clusters} clusters "
+            f"within {self.threshold:.6f}{summary}"
         )
         return {'FINISHED'}
 
+    def gather(self, objects, radius):
+        """Grid, coordinates and scope mask per object."""
+        if self.scope == 'OBJECTS':
+            coords = [world_coords(o, read_coords(o)) for o in objects]
+            grids = [get_vertex_grid(o, co, radius, world=True)
+                     for o, co in zip(objects, coords)]
+            return grids, coords, [None] * len(objects)
+
+        obj = objects[0]
+        co = read_coords(obj)
+        mask = None
+        if self.scope == 'SELECTED':
+            mask = read_flags(obj.data.vertices)
+        elif self.scope == 'BOUNDARY':
+            mask = non_manifold_verts(obj.data)
+        return [get_vertex_grid(obj, co, radius)], [co], [mask]
+
+    def find_pairs(self, grids, coords, masks, radius):
+        """Pairs within radius, indices into the concatenated verts. With
+        several objects only the pairs between objects."""
+        if len(grids) == 1:
+            return grids[0].pairs(radius, masks[0])
+        offsets = np.cumsum([0] + [len(co) for co in coords])
+        found_i, found_j, found_d = [], [], []
+        for b in range(1, len(grids)):
+            for a in range(b):
+                i, j, d = grids[b].query(coords[a], radius)
+                found_i.append(i + offsets[a])
+                found_j.append(j + offsets[b])
+                found_d.append(d)
+        return np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_d)
+
+
+def offset_x(data, dx):
+    """Add dx to the X coordinate of every element of data (verts, key points)."""
+    co = np.empty(len(data) * 3, dtype=np.float32)
+    data.foreach_get("co", co)
+    co[0::3] += dx
+    data.foreach_set("co", co)
+
 
 class MESH_OT_center_selected_x_edit(bpy.types.Operator):
     bl_idname = "mesh.center_selected_x_edit"
     bl_label = "Center Selected X in Edit Mode"
     bl_options = {'REGISTER', 'UNDO'}
 
+    shape_keys: bpy.props.BoolProperty(
+        name="All Shape Keys",
+        default=True,
+        description="Move every shape key by the same offset so they stay aligned, "
+                    "else only the shape shown in Edit Mode"
+    )
+
     @classmethod
     def poll(cls, context):
         obj = context.active_object
@@ -124,32 +673,139 @@ class MESH_OT_center_selected_x_edit(bpy.types.Operator):
 
     def execute(self, context):
         obj = context.active_object
-        mesh = obj.data
 
-        # Build a BMesh representation to read selection
-        bm = bmesh.from_edit_mesh(mesh)
+        with object_mode_data(obj) as me:
+            # Average X of the selected verts in local space
+            sel = read_flags(me.vertices)
+            if not sel.any():
+                self.report({'WARNING'}, "No vertices selected")
+                return {'CANCELLED'}
+            co = read_coords(obj)
+            dx = -float(co[sel, 0].mean(dtype=np.float64))
+
+            # Offset the whole mesh along local X, selection stays as it is
+            if self.shape_keys and me.shape_keys:
+                for kb in me.shape_keys.key_blocks:
+                    offset_x(kb.data, dx)
+                offset_x(me.vertices, dx)
+                me.update()
+            else:
+                co[:, 0] += dx
+                write_coords(obj, co)
+
+        self.report({'INFO'}, f"Moved mesh by {dx:.6f} along X")
+        return {'FINISHED'}
 
-        # Collect only the verts that are currently selected
-        sel_verts = [v for v in bm.verts if v.select]
-        if not sel_verts:
-            self.report({'WARNING'}, "No vertices selected")
-            return {'CANCELLED'}
 
-        # Compute average X of selected verts in local space
-        avg_x = sum(v.co.x for v in sel_verts) / len(sel_verts)
-        dx = -avg_x
+# X-mirror partner per vertex, stored on the mesh for symmetry tools
+MIRROR_ATTR_NAME = "mirror_index"
+# mesh property with the vertex count, coordinate hash and tolerance the
+# mirror map was built for
+MIRROR_KEY_PROP = "mirror_index_key"
+
+
+def mirror_map(grid, co, tolerance):
+    """Index of the closest vertex to the X-mirrored position of every
+    vertex, -1 where none is within tolerance."""
+    reflected = co * np.array([-1.0, 1.0, 1.0])
+    p, v, d = grid.query(reflected, tolerance)
+    order = np.lexsort((d, p))
+    p, v = p[order], v[order]
+    closest = np.ones(len(p), dtype=bool)
+    closest[1:] = p[1:] != p[:-1]
+    mirror = np.full(len(co), -1, dtype=np.int32)
+    mirror[p[closest]] = v[closest]
+    return mirror
+
+
+def mirror_key(co, tolerance):
+    digest = hashlib.blake2b(np.ascontiguousarray(co, dtype=np.float32).tobytes(), digest_size=8)
+    return f"{len(co)}:{digest.hexdigest()}:{tolerance:.6g}"
+
+
+def write_mirror_map(me, mirror, co, tolerance):
+    attr = me.attributes.get(MIRROR_ATTR_NAME)
+    if not attr:
+        attr = me.attributes.new(MIRROR_ATTR_NAME, 'INT', 'POINT')
+    attr.data.foreach_set("value", mirror)
+    me[MIRROR_KEY_PROP] = mirror_key(co, tolerance)
+
+
+def read_mirror_map(obj, tolerance):
+    """Cached mirror map of the mesh, None if it wasn't built or the vertices
+    moved or changed since. Reads the mesh data, so call it in Object Mode
+    or inside object_mode_data()."""
+    me = obj.data
+    attr = me.attributes.get(MIRROR_ATTR_NAME)
+    if not attr or me.get(MIRROR_KEY_PROP) != mirror_key(read_coords(obj), tolerance):
+        return None
+    mirror = np.empty(len(me.vertices), dtype=np.int32)
+    attr.data.foreach_get("value", mirror)
+    return mirror
+
+
+def get_mirror_map(obj, tolerance):
+    """read_mirror_map(), rebuilt and stored again when outdated."""
+    mirror = read_mirror_map(obj, tolerance)
+    if mirror is None:
+        co = read_coords(obj)
+        mirror = mirror_map(get_vertex_grid(obj, co, tolerance), co, tolerance)
+        write_mirror_map(obj.data, mirror, co, tolerance)
+    return mirror
+
+
+class MESH_OT_build_mirror_map(bpy.types.Operator):
+    bl_idname = "mesh.build_mirror_map"
+    bl_label = "Build Mirror Map"
+    bl_description = (
+        "Store the X-mirror partner of every vertex in the 'mirror_index' attribute "
+        "and select the vertices without one"
+    )
+    bl_options = {'REGISTER', 'UNDO'}
+
+    tolerance: bpy.props.FloatProperty(
+        name="Tolerance",
+        default=0.0001,
+        min=0.0,
+        precision=5,
+        subtype='DISTANCE',
+        description="Max distance between a vertex and the mirrored position of its partner"
+    )
+    select_unpaired: bpy.props.BoolProperty(
+        name="Select Unpaired",
+        default=True,
+        description="Select only the vertices without a mirror partner"
+    )
+
+    @classmethod
+    def poll(cls, context):
+        obj = context.active_object
+        return obj and obj.type == 'MESH' and context.mode == 'EDIT_MESH'
+
+    def execute(self, context):
+        obj = context.edit_object
+
+        with object_mode_data(obj) as me:
+            # the stored map is reused while vertices and tolerance are unchanged
+            mirror = get_mirror_map(obj, self.tolerance)
 
-        # Ensure the mesh is up-to-date before running ops
-        bmesh.update_edit_mesh(mesh, loop_triangles=False, destructive=False)
+            unpaired = mirror < 0
+            paired = np.flatnonzero(~unpaired)
+            # a's partner has another vertex as its own partner
+            one_sided = int(np.count_nonzero(mirror[mirror[paired]] != paired))
+            if self.select_unpaired:
+                write_vertex_selection(me, unpaired)
 
-        # Select all verts so that transform affects the entire mesh
-        bpy.ops.mesh.select_all(action='SELECT')
+        if self.select_unpaired:
+            bm = bmesh.from_edit_mesh(obj.data)
+            bm.select_flush_mode()
+            bmesh.update_edit_mesh(obj.data, loop_triangles=False, destructive=False)
 
-        # Translate in Edit Mode along local X by dx
-        bpy.ops.transform.translate(
-            value=(dx, 0.0, 0.0),
-            orient_type='LOCAL',
-            constraint_axis=(True, False, False),
+        count = int(np.count_nonzero(unpaired))
+        self.report(
+            {'WARNING' if count else 'INFO'},
+            f"Mirror map: {len(paired)} paired, {count} unpaired, "
+            f"{one_sided} one-sided within {self.tolerance:.6f}"
         )
         return {'FINISHED'}
 
@@ -157,6 +813,7 @@ class MESH_OT_center_selected_x_edit(bpy.types.Operator):
 def menu_func(self, context):
     self.layout.operator(MESH_OT_zero_x_selected.bl_idname)
     self.layout.operator(MESH_OT_center_selected_x_edit.bl_idname)
+    self.layout.operator(MESH_OT_build_mirror_map.bl_idname)
     
 
 def merge_menu_func(self, context):
@@ -173,6 +830,7 @@ def register():
     bpy.utils.register_class(MESH_OT_zero_x_selected)
     bpy.utils.register_class(MESH_OT_merge_by_distance_preview)
     bpy.utils.register_class(MESH_OT_center_selected_x_edit)
+    bpy.utils.register_class(MESH_OT_build_mirror_map)
     
     bpy.types.VIEW3D_MT_edit_mesh_vertices.append(menu_func)
     bpy.types.VIEW3D_MT_edit_mesh_merge.append(merge_menu_func)
@@ -182,10 +840,14 @@ def unregister():
     bpy.types.VIEW3D_MT_edit_mesh_vertices.remove(menu_func)
     bpy.types.VIEW3D_MT_edit_mesh_merge.remove(merge_menu_func)
     
+    bpy.utils.unregister_class(MESH_OT_build_mirror_map)
     bpy.utils.unregister_class(MESH_OT_center_selected_x_edit)
     bpy.utils.unregister_class(MESH_OT_merge_by_distance_preview)
     bpy.utils.unregister_class(MESH_OT_zero_x_selected)
 
+    _grid_cache.clear()
+    _sweep_cache.clear()
+
 
 if __name__ == "__main__":
     register()
@@ -1,23 +1,30 @@
-import bmesh
 import bpy
+import numpy as np
 
 from .. import log
+from .meshedit import dependent_keys
 
 bl_info = {
     "name": "Reset Active Shape Key to Reference (Selected Verts)",
     "author": "",
     "version": (1, 0, 0),
     "blender": (3, 0, 0),
-    "location": "3D View > Edit Mode (Mesh) > Vertex Menu",
+    "location": "3D View > Edit Mode (Mesh) > Vertex Menu, Properties > Shape Keys > Specials Menu",
     "description": (
         "Resets the active shape key to match its reference (relative key or Basis)\n"
-        "for the selected vertices in Edit Mode."
+        "for the selected vertices in Edit Mode (or Object Mode)."
     ),
     "warning": "",
     "doc_url": "",
     "category": "Mesh",
 }
 
+def read_key_coords(key_block):
+    co = np.empty(len(key_block.data) * 3, dtype=np.float32)
+    key_block.data.foreach_get('co', co)
+    return co.reshape(-1, 3)
+
+
 class MESH_OT_reset_active_shapekey_to_reference(bpy.types.Operator):
     """Reset the active shape key's coordinates to its reference for the selected vertices.
 
@@ -27,6 +34,9 @@ class MESH_OT_reset_active_shapekey_to_reference(bpy.types.Operator):
     - Otherwise, we copy from the first key (Basis).
 
     This makes 'reset' behave correctly even when a key is relative to something other than Basis.
+    Coordinates are compared and copied as arrays and written with one foreach_set. Keys
+    relative to the active key get the same offset, as an Edit Mode edit would give them.
+    In Edit Mode this needs one round trip to Object Mode; in Object Mode none.
     """
 
     bl_idname = "mesh.reset_active_shapekey_to_reference"
@@ -40,7 +50,7 @@ class MESH_OT_reset_active_shapekey_to_reference(bpy.types.Operator):
         obj = context.active_object
         if not obj or obj.type != 'MESH':
             return False
-        if context.mode != 'EDIT_MESH':
+        if context.mode not in {'EDIT_MESH', 'OBJECT'}:
             return False
 
         me = obj.data
@@ -73,14 +83,11 @@ class MESH_OT_reset_active_shapekey_to_reference(bpy.types.Operator):
                                None) if use_relative else None
         reference_key = relative_key if relative_key else basis_key
 
-        # Gather selection from Edit Mode
-        bm = bmesh.from_edit_mesh(me)
-        selected_indices = [v.index for v in bm.verts if v.select]
-
-        if not selected_indices:
-            self.report(
-                {'WARNING'}, "No selected vertices. Select some vertices in Edit Mode and try again.")
-            return {'CANCELLED'}
+        # Flush Edit Mode changes to read the current selection and keys; the
+        # write below still needs a round trip to Object Mode
+        in_edit = obj.mode == 'EDIT'
+        if in_edit:
+            obj.update_from_editmode()
 
         # Sanity checks
         nv = len(me.vertices)
@@ -89,58 +96,52 @@ class MESH_OT_reset_active_shapekey_to_reference(bpy.types.Operator):
                 {'ERROR'}, "Vertex count mismatch between mesh and shape keys.")
             return {'CANCELLED'}
 
+        selected = np.empty(nv, dtype=bool)
+        me.vertices.foreach_get('select', selected)
+        if not selected.any():
+            self.report(
+                {'WARNING'}, "No selected vertices. Select some vertices and try again.")
+            return {'CANCELLED'}
+
         # Debug header
-        log.debug(f"Object: {obj.name}")
-        log.debug(f"Mesh verts: {nv}")
+        log.debug(f"Object: {obj.name}, mesh verts: {nv}, selected: {int(selected.sum())}")
         log.debug(f"Active key: {active_key.name}, Index: {obj.active_shape_key_index}")
-        log.debug(f"System use_relative: {use_relative}")
         log.debug(f"Reference key: {reference_key.name}, {'(relative to active)' if relative_key else '(Basis)'}")
-        log.debug(f"Active value: {getattr(active_key, 'value', None)}, Active muted: {getattr(active_key, 'mute', None)}")
-        log.debug(f"Show only active (object): {getattr(obj, 'show_only_shape_key', None)}")
-        log.debug(f"Use shape key edit mode (object): {getattr(obj, 'use_shape_key_edit_mode', None)}")
-        log.debug(f"Selected verts count: {len(selected_indices)}, sample: {selected_indices[:20]}, {'...' if len(selected_indices) > 20 else ''}")
 
-        # Apply: copy reference coords into the active key for each selected vertex
+        # Apply: copy reference coords into the active key for the selected verts
         # Note: This sets absolute coords, zeroing the delta relative to the reference.
-        changed = 0
-        sample_diffs = []
-        
-        mode = context.object.mode
-        bpy.ops.object.mode_set(mode='OBJECT')
-        
-        for i in selected_indices:
-            src = reference_key.data[i].co
-            dst = active_key.data[i].co
-            if len(sample_diffs) < 10:
-                # store a tiny sample of coordinates and deltas for inspection
-                sample_diffs.append(src.copy())
-                sample_diffs.append(dst.copy())
-                sample_diffs.append((i, (dst - src).length))
-            if dst != src:
-                active_key.data[i].co = src.copy()
-                changed += 1
-                
-        bpy.ops.object.mode_set(mode=mode)
-
-        log.debug(f"Changed verts: {changed}/{len(selected_indices)}")
-        if sample_diffs:
-            # Print first few before/after magnitudes (distance to reference before write)
-            log.debug(f"Sample pre-reset deltas (lengths): {sample_diffs}")
-
-        # Refresh viewport
-        me.update()
-        bmesh.update_edit_mesh(me, loop_triangles=False, destructive=False)
-
-        # Extra hints if nothing seemed to change
-        if changed == 0:
+        ref_co = read_key_coords(reference_key)
+        active_co = read_key_coords(active_key)
+        changed = selected & (active_co != ref_co).any(axis=1)
+        indices = np.flatnonzero(changed)
+
+        if len(indices):
+            offset = ref_co[indices] - active_co[indices]
+            log.debug(f"Changed verts: {len(indices)}, "
+                      f"max delta: {np.linalg.norm(offset, axis=1).max():.6f}")
+            active_co[indices] = ref_co[indices]
+
+            # Key data written in Edit Mode is overwritten when leaving it
+            if in_edit:
+                bpy.ops.object.mode_set(mode='OBJECT')
+            active_key.data.foreach_set('co', active_co.ravel())
+            for kb in dependent_keys(keys, active_key):
+                co = read_key_coords(kb)
+                co[indices] += offset
+                kb.data.foreach_set('co', co.ravel())
+                log.debug(f"Moved dependent key '{kb.name}' along")
+            me.update()
+            if in_edit:
+                bpy.ops.object.mode_set(mode='EDIT')
+        else:
             log.debug("No coordinate differences found to overwrite; verts might already match the reference.")
 
         self.report(
-            {'INFO'}, f"Reset {len(selected_indices)} vertices on '{active_key.name}' to '{reference_key.name}'.")
+            {'INFO'}, f"Reset {len(indices)} vertices on '{active_key.name}' to '{reference_key.name}'.")
         return {'FINISHED'}
 
 
-# Menu entry in Mesh Edit Mode > Vertices
+# Menu entry in Mesh Edit Mode > Vertices and in the Shape Keys specials menu
 def menu_func(self, context):
     self.layout.operator(
         MESH_OT_reset_active_shapekey_to_reference.bl_idname,
@@ -158,9 +159,11 @@ def register():
     for cls in classes:
         bpy.utils.register_class(cls)
     bpy.types.VIEW3D_MT_edit_mesh_vertices.append(menu_func)
+    bpy.types.MESH_MT_shape_key_context_menu.append(menu_func)
 
 
 def unregister():
+    bpy.types.MESH_MT_shape_key_context_menu.remove(menu_func)
     bpy.types.VIEW3D_MT_edit_mesh_vertices.remove(menu_func)
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
@@ -4,9 +4,17 @@ from bpy.types import Operator
 import bpy
 import json
 import bpy, os, json, requests
-from bpy.props import StringProperty, BoolProperty
+import concurrent.futures
+import hashlib
+import numpy as np
+import re
+import subprocess
+import sys
+import threading
+import time
+from bpy.props import StringProperty, BoolProperty, FloatProperty, IntProperty
 from bpy.types import Operator, Panel, PropertyGroup, AddonPreferences
-from collections import defaultdict
+from collections import Counter, defaultdict
 
 bl_info = {
     "name": "Rigify Bone Mapper (Experimental)",
@@ -16,7 +24,7 @@ bl_info = {
     "location": (
         "3D View > Sidebar (N) > Rigify Tab\n"
         "Operators: Export Metarig Bones, Scan Imported Rig,\n"
-        "Generate Mapping via LLM, Apply Mapping, Transfer Mesh Weights"
+        "Generate Mapping via Rules, Geometry or LLM, Apply Mapping, Transfer Mesh Weights"
     ),
     "description": (
         "Experimental tools to assist in mapping bones from an imported rig\n"
@@ -30,30 +38,800 @@ bl_info = {
 }
 
 
+#  Rule based matcher
+
+# Rigify human metarig targets
+TORSO_CHAIN = ["spine", "spine.001", "spine.002", "spine.003"]
+NECK_CHAIN = ["spine.004", "spine.005"]
+HEAD_BONE = "spine.006"
+LIMB_TARGETS = {
+    "clavicle": "shoulder",
+    "upperarm": "upper_arm",
+    "forearm": "forearm",
+    "hand": "hand",
+    "thigh": "thigh",
+    "shin": "shin",
+    "foot": "foot",
+    "toe": "toe",
+    "breast": "breast",
+    "eye": "eye",
+}
+FINGER_TARGETS = ["thumb", "f_index", "f_middle", "f_ring", "f_pinky"]
+FINGER_SEGMENTS = 3
+
+# Prefixes of common rigs that carry no information
+NAME_PREFIX_RE = re.compile(r"^(ValveBiped\.)?(Bip0*1|Bip001)[ _.]?|^(mixamorig\d*|DEF|ORG)[-_:.]?", re.I)
+
+# token sets -> body part, first match wins
+PART_TOKENS = [
+    ("finger", [{"thumb"}, {"index"}, {"pointer"}, {"middle"}, {"ring"}, {"pinky"},
+                {"little"}, {"finger"}, {"digit"}]),
+    ("clavicle", [{"clavicle"}, {"collar"}, {"shoulder"}]),
+    ("forearm", [{"forearm"}, {"lowerarm"}, {"lower", "arm"}, {"fore", "arm"}, {"elbow"}]),
+    ("upperarm", [{"upperarm"}, {"upper", "arm"}, {"shldr"}, {"arm"}]),
+    ("hand", [{"hand"}, {"wrist"}]),
+    ("thigh", [{"thigh"}, {"upleg"}, {"up", "leg"}, {"upperleg"}, {"upper", "leg"}]),
+    ("shin", [{"shin"}, {"calf"}, {"lowerleg"}, {"lower", "leg"}, {"knee"}, {"leg"}]),
+    ("foot", [{"foot"}, {"ankle"}]),
+    ("toe", [{"toe"}, {"toes"}, {"ball"}]),
+    ("head", [{"head"}]),
+    ("neck", [{"neck"}]),
+    ("hips", [{"hips"}, {"hip"}, {"pelvis"}]),
+    ("spine", [{"spine"}, {"abdomen"}, {"chest"}, {"torso"}, {"waist"}]),
+    ("breast", [{"breast"}, {"pectoral"}, {"boob"}]),
+    ("eye", [{"eye"}]),
+    ("jaw", [{"jaw"}]),
+]
+FINGER_NAMES = {"thumb": 0, "index": 1, "pointer": 1, "middle": 2, "ring": 3, "pinky": 4, "little": 4}
+
+# tokens that turn a bone into an extra instead of a body part
+CATEGORY_TOKENS = [
+    ("IK", {"ik", "pole", "target"}),
+    ("attach_point", {"attach", "attachment", "weapon", "prop", "socket", "grip"}),
+    ("hair", {"hair", "braid", "ponytail", "bang", "bangs"}),
+    ("cloth", {"skirt", "cape", "cloth", "coat", "sleeve", "dress", "hood", "scarf"}),
+    ("accessory", {"bag", "belt", "hat", "earring", "necklace", "glasses"}),
+]
+HELPER_TOKENS = {"twist", "roll", "helper", "corrective", "end", "nub", "top", "metatarsals"}
+NOISE_TOKENS = {"bone", "jnt", "joint", "bn", "base", "bend", "mch", "valve", "biped"}
+SIDE_TOKENS = {"l": "L", "left": "L", "r": "R", "right": "R"}
+
+
+def tokenize(name):
+    """Lower case tokens of a bone name, split on separators, camelCase and digits."""
+    name = name.rsplit(":", 1)[-1]
+    name = NAME_PREFIX_RE.sub("", name)
+    name = re.sub(r"([a-z])([A-Z])", r"\1 \2", name)
+    name = re.sub(r"([A-Za-z])(\d)", r"\1 \2", name)
+    name = re.sub(r"(\d)([A-Za-z])", r"\1 \2", name)
+    return [t for t in re.split(r"[^a-z0-9]+", name.lower()) if t]
+
+
+def bone_features(name):
+    """(part, side, finger, number, category, tokens) from a bone name."""
+    tokens = tokenize(name)
+    side = None
+    words = []
+    numbers = []
+    for t in tokens:
+        if t in SIDE_TOKENS and side is None:
+            side = SIDE_TOKENS[t]
+        elif t.isdigit():
+            numbers.append(t)
+        elif t not in NOISE_TOKENS:
+            words.append(t)
+    word_set = set(words)
+    category = None
+    for cat, cat_tokens in CATEGORY_TOKENS:
+        if word_set & cat_tokens:
+            category = cat
+            break
+
+    part = None
+    for part_name, groups in PART_TOKENS:
+        if any(g <= word_set for g in groups):
+            part = part_name
+            break
+
+    finger = None
+    number = int(numbers[-1]) if numbers else None
+    if part == "finger":
+        named = [FINGER_NAMES[w] for w in words if w in FINGER_NAMES]
+        if named:
+            finger = named[0]
+        elif numbers:
+            # ValveBiped 'Finger01' (finger 0, segment 1), 'Digit11' (1-based)
+            digits = numbers[-1]
+            offset = 1 if "digit" in word_set else 0
+            finger = int(digits[0]) - offset
+            number = int(digits[1:]) if len(digits) > 1 else None
+        if finger is None or not 0 <= finger < len(FINGER_TARGETS):
+            part = None
+
+    if word_set & HELPER_TOKENS:
+        category = category or "unmappable"
+        part = None
+
+    return part, side, finger, number, category, words
+
+
+def bone_depths(imp_list):
+    """Hierarchy depth of every bone in an imported bone list."""
+    parents = {b["name"]: b["parent"] for b in imp_list}
+    depths = {}
+
+    def depth(name):
+        if name not in depths:
+            parent = parents.get(name)
+            depths[name] = depth(parent) + 1 if parent in parents else 0
+        return depths[name]
+
+    for name in parents:
+        depth(name)
+    return depths
+
+
+def fit_chain(sources, targets):
+    """Map a chain onto target names, keeping the end segments and dropping
+    excess segments in the middle. Returns {source: target}."""
+    if len(sources) <= len(targets):
+        # short chains: fill from the start, last bone maps to the last target
+        result = dict(zip(sources[:-1], targets))
+        if sources:
+            result[sources[-1]] = targets[len(sources) - 1 if len(sources) < 2 else -1]
+        return result
+    head = (len(targets) + 1) // 2
+    tail = len(targets) - head
+    kept = sources[:head] + (sources[-tail:] if tail else [])
+    return dict(zip(kept, targets))
+
+
+def rigify_style_name(words, number, side):
+    """<meaningful name>.<number>.<L/R>, as asked from the LLM."""
+    name = "_".join(words) or "bone"
+    if number is not None:
+        name += f".{number:03d}"
+    if side:
+        name += f".{side}"
+    return name
+
+
+def rule_based_mapping(imp_list, meta_names=None):
+    """Deterministic mapping for common naming conventions (ValveBiped,
+    Mixamo, DAZ, UE and similar), in the format of bone_mapping.json."""
+    depths = bone_depths(imp_list)
+    parents = {b["name"]: b["parent"] for b in imp_list}
+    feats = {b["name"]: bone_features(b["name"]) for b in imp_list}
+    by_depth = sorted(feats, key=lambda n: (depths[n], n))
+
+    assigned = {}  # imported -> (rigify, comment)
+
+    # spine: path from the head up to the hips, split into torso/neck/head
+    heads = [n for n in by_depth if feats[n][0] == "head" and feats[n][4] is None]
+    if heads:
+        path = []
+        name = heads[0]
+        while name is not None:
+            path.append(name)
+            name = parents.get(name)
+        path.reverse()
+        hips = [i for i, n in enumerate(path) if feats[n][0] == "hips"]
+        start = hips[-1] if hips else next(
+            (i for i, n in enumerate(path) if feats[n][0] == "spine"), len(path) - 1)
+        chain = path[start:-1]
+        neck_start = next((i for i, n in enumerate(chain) if feats[n][0] == "neck"), len(chain))
+        for src, tgt in fit_chain(chain[:neck_start], TORSO_CHAIN).items():
+            assigned[src] = (tgt, "rule: torso chain")
+        for src, tgt in fit_chain(chain[neck_start:], NECK_CHAIN).items():
+            assigned[src] = (tgt, "rule: neck chain")
+        assigned[heads[0]] = (HEAD_BONE, "rule: head")
+
+    # limbs and fingers, per side; shallowest bone wins, fingers by depth
+    fingers = defaultdict(list)
+    for name in by_depth:
+        part, side, finger, number, category, _ = feats[name]
+        if name in assigned or category or not part or part in {"head", "neck", "hips", "spine"}:
+            continue
+        if part == "finger":
+            if side:
+                fingers[(finger, side)].append(name)
+            continue
+        if part == "jaw":
+            target = "jaw"
+        elif part in LIMB_TARGETS and side:
+            target = f"{LIMB_TARGETS[part]}.{side}"
+        else:
+            continue
+        if target not in {t for t, _ in assigned.values()}:
+            assigned[name] = (target, f"rule: {part}")
+
+    for (finger, side), names in fingers.items():
+        for segment, name in enumerate(names[:FINGER_SEGMENTS]):
+            assigned[name] = (
+                f"{FINGER_TARGETS[finger]}.{segment + 1:02d}.{side}", "rule: finger by depth")
+
+    # everything else becomes an extra with a Rigify style name
+    mapping = []
+    used = set()
+    for b in imp_list:
+        name = b["name"]
+        target, comment = assigned.get(name, (None, None))
+        if target and (meta_names is None or target in meta_names):
+            mapping.append({"comment": comment, "imported": name,
+                            "rigify": target, "category": "mappable"})
+            used.add(target)
+
+    mapped = {e["imported"] for e in mapping}
+    mapping += extra_entries(
+        [b["name"] for b in imp_list if b["name"] not in mapped], used,
+        "rule: no body part match")
+    return mapping
+
+
+def extra_entries(names, used, comment):
+    """Mapping entries for bones without a Rigify counterpart, named in Rigify
+    style and unique against used, which is updated."""
+    entries = []
+    for name in names:
+        part, side, finger, number, category, words = bone_features(name)
+        target = rigify_style_name(words, number, side)
+        i = 1
+        while target in used:
+            target = rigify_style_name(words + [str(i)], number, side)
+            i += 1
+        used.add(target)
+        entries.append({"comment": comment, "imported": name,
+                        "rigify": target, "category": category or "unmappable"})
+    return entries
+
+
+#  Mapping cache
+
+def bone_list_hash(imp_list):
+    """Content hash of an imported bone list, independent of the bone order."""
+    items = sorted((b["name"], b["parent"] or "") for b in imp_list)
+    return hashlib.sha256(json.dumps(items).encode("utf-8")).hexdigest()
+
+
+def mapping_cache_path(imp_list):
+    directory = bpy.utils.user_resource(
+        'CONFIG', path=os.path.join("k_blender_tools", "rigify_mappings"), create=True)
+    return os.path.join(directory, bone_list_hash(imp_list) + ".json")
+
+
+def load_cached_mapping(imp_list):
+    """Mapping stored for the same imported bone list, or None."""
+    path = mapping_cache_path(imp_list)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        log.warning(f"Ignoring unreadable mapping cache {path}", exc_info=True)
+        return None
+
+
+def store_cached_mapping(imp_list, mapping):
+    path = mapping_cache_path(imp_list)
+    # write and rename, batch workers may store the same rig concurrently
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(mapping, f, indent=2)
+    os.replace(tmp, path)
+    log.info(f"Stored mapping cache {path}")
+
+
+#  Mapping bundle
+#
+# Bone lists, rest geometry and the current mapping in one versioned JSON text
+# datablock stored in the .blend. Bones are parallel arrays in armature space,
+# parents and mapping entries are indices into them. The JSON files next to
+# the .blend are still written for reading and hand editing; a bone_mapping.json
+# edited after it was written takes precedence over the bundled mapping.
+
+BUNDLE_TEXT = "rigify_mapping_bundle.json"
+BUNDLE_FORMAT = "k_blender_tools.rigify_mapping"
+BUNDLE_VERSION = 1
+ARRAY_KEYS = ("head", "tail", "roll", "matrix")
+ARRAY_SHAPES = {"head": (-1, 3), "tail": (-1, 3), "matrix": (4, 4)}
+
+
+def armature_arrays(arm_obj):
+    """Names, parent indices and rest head/tail/roll of an armature's bones."""
+    bones = arm_obj.data.bones
+    n = len(bones)
+    names = [b.name for b in bones]
+    index = {name: i for i, name in enumerate(names)}
+    head = np.empty(n * 3, dtype=np.float64)
+    tail = np.empty(n * 3, dtype=np.float64)
+    bones.foreach_get("head_local", head)
+    bones.foreach_get("tail_local", tail)
+    roll = [bpy.types.Bone.AxisRollFromMatrix(b.matrix_local.to_3x3())[1] for b in bones]
+    return {
+        "names": names,
+        "parents": np.array([index[b.parent.name] if b.parent else -1 for b in bones],
+                            dtype=np.int64),
+        "head": head.reshape(n, 3),
+        "tail": tail.reshape(n, 3),
+        "roll": np.array(roll, dtype=np.float64),
+        "connect": [b.use_connect for b in bones],
+        "matrix": np.array(arm_obj.matrix_world, dtype=np.float64),
+    }
+
+
+def bone_list(arrays):
+    """[{name, parent}] as in imported_bones.json, from armature arrays."""
+    names = arrays["names"]
+    bones = [{"name": name, "parent": names[p] if p >= 0 else None}
+             for name, p in zip(names, arrays["parents"].tolist())]
+    return sorted(bones, key=lambda e: e["name"])
+
+
+def load_bundle():
+    """The bundle of this .blend with numpy arrays, or None."""
+    text = bpy.data.texts.get(BUNDLE_TEXT)
+    if text is None:
+        return None
+    try:
+        data = json.loads(text.as_string())
+    except ValueError:
+        log.warning(f"Ignoring unreadable text '{BUNDLE_TEXT}'", exc_info=True)
+        return None
+    if data.get("format") != BUNDLE_FORMAT or data.get("version") != BUNDLE_VERSION:
+        log.warning(f"Ignoring '{BUNDLE_TEXT}' of unsupported version {data.get('version')}")
+        return None
+    for part in ("metarig", "imported"):
+        arrays = data.get(part)
+        if arrays:
+            arrays["parents"] = np.array(arrays["parents"], dtype=np.int64)
+            arrays.setdefault("matrix", np.identity(4).ravel().tolist())
+            for key in ARRAY_KEYS:
+                arrays[key] = np.array(arrays[key], dtype=np.float64)
+                if key in ARRAY_SHAPES:
+                    arrays[key] = arrays[key].reshape(ARRAY_SHAPES[key])
+    return data
+
+
+def save_bundle(data):
+    out = dict(data, format=BUNDLE_FORMAT, version=BUNDLE_VERSION)
+    for part in ("metarig", "imported"):
+        arrays = data.get(part)
+        if arrays:
+            out[part] = dict(arrays, parents=arrays["parents"].tolist(),
+                             **{k: np.round(arrays[k], 6).ravel().tolist() for k in ARRAY_KEYS})
+    text = bpy.data.texts.get(BUNDLE_TEXT) or bpy.data.texts.new(BUNDLE_TEXT)
+    text.use_fake_user = True
+    text.from_string(json.dumps(out, separators=(",", ":")))
+
+
+def update_bundle(**parts):
+    """Replace parts ('metarig', 'imported', 'mapping', ...) of the bundle."""
+    data = load_bundle() or {}
+    data.update(parts)
+    save_bundle(data)
+
+
+def bundle_mapping(data):
+    """Mapping entries from the bundle's index arrays, or None."""
+    mapping = data.get("mapping") if data else None
+    if not mapping or not data.get("imported"):
+        return None
+    names = data["imported"]["names"]
+    return [{"comment": c, "imported": names[i], "rigify": r, "category": cat}
+            for i, r, cat, c in zip(mapping["imported"], mapping["rigify"],
+                                    mapping["category"], mapping["comment"])]
+
+
+def mapping_part(mapping, imported_names):
+    """Index array form of a mapping, dropping unknown imported bones."""
+    index = {name: i for i, name in enumerate(imported_names)}
+    entries = [e for e in mapping if e["imported"] in index]
+    return {
+        "imported": [index[e["imported"]] for e in entries],
+        "rigify": [e["rigify"] for e in entries],
+        "category": [e["category"] for e in entries],
+        "comment": [e.get("comment") for e in entries],
+    }
+
+
+def file_stamp(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+_json_cache = {}  # path -> (mtime, size, data)
+
+
+def read_json(path):
+    """Parsed JSON file, re-read only when the file changed on disk.
+    Callers share the returned data and must not modify it."""
+    st = os.stat(path)
+    cached = _json_cache.get(path)
+    if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+    with open(path, "r") as f:
+        data = json.load(f)
+    _json_cache[path] = (st.st_mtime_ns, st.st_size, data)
+    return data
+
+
+def sidecar_dir():
+    """Directory for the JSON sidecars: the saved .blend's, None if unsaved."""
+    return os.path.dirname(bpy.data.filepath) or None
+
+
+def load_bone_lists(directory):
+    """Metarig names and imported [{name, parent}], from the bundle or from
+    metarig_bones.json and imported_bones.json in directory."""
+    data = load_bundle()
+    if data and data.get("metarig") and data.get("imported"):
+        return sorted(data["metarig"]["names"]), bone_list(data["imported"])
+    if directory is None:
+        raise FileNotFoundError("Scan the imported rig and export the metarig bones first")
+    return (read_json(os.path.join(directory, "metarig_bones.json")),
+            read_json(os.path.join(directory, "imported_bones.json")))
+
+
+def load_mapping(directory):
+    """Current mapping: bone_mapping.json if it was edited since it was
+    bundled, else the bundled mapping, else bone_mapping.json."""
+    path = os.path.join(directory, "bone_mapping.json") if directory else None
+    data = load_bundle()
+    mapping = bundle_mapping(data)
+    if mapping is not None and not (
+            path and os.path.exists(path) and file_stamp(path) != data.get("mapping_file")):
+        return mapping
+    if path is None:
+        raise FileNotFoundError("No bone mapping in this file")
+    return read_json(path)
+
+
+def write_mapping(directory, mapping):
+    """Bundle the mapping with the imported bones and write bone_mapping.json
+    to directory, if any. Returns where the mapping went."""
+    outpath = None
+    if directory is not None:
+        outpath = os.path.join(directory, "bone_mapping.json")
+        with open(outpath, "w") as f:
+            json.dump(mapping, f, indent=2)
+    data = load_bundle()
+    if data and data.get("imported"):
+        update_bundle(mapping=mapping_part(mapping, data["imported"]["names"]),
+                      mapping_file=file_stamp(outpath) if outpath else None)
+    return outpath or BUNDLE_TEXT
+
+
+def scan_armature(arm_obj, part, directory=None):
+    """Bundle the bones of arm_obj as part ('metarig' or 'imported') and write
+    its JSON bone list to directory, if any. Returns where the list went."""
+    arrays = armature_arrays(arm_obj)
+    if part == "imported":
+        # a new bone list invalidates the bundled mapping indices
+        update_bundle(imported=arrays, mapping=None, mapping_file=None)
+        data = bone_list(arrays)
+    else:
+        update_bundle(metarig=arrays)
+        data = sorted(arrays["names"])
+    if directory is None:
+        return BUNDLE_TEXT
+    path = os.path.join(directory, f"{part}_bones.json")
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    return path
+
+
+#  Geometric matcher
+#
+# Both rigs are brought to a common frame (world orientation, feet at zero,
+# unit height), then every imported/metarig bone pair gets a cost from head
+# and tail distance, direction, relative chain depth, child count and side.
+# A minimum cost assignment picks the pairs; pairs above max_cost stay extras.
+
+GEO_WEIGHTS = {"direction": 0.1, "depth": 0.2, "children": 0.05, "side": 1.0}
+
+
+def linear_assignment(cost):
+    """Minimum cost assignment of a rows x cols cost matrix with rows <= cols.
+    Returns the column for every row. Shortest augmenting paths with
+    potentials (Hungarian method), the column scan is vectorized."""
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)    # row (1-based) assigned to column, 0 = free
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used
+            free[0] = False
+            cur = np.full(m + 1, np.inf)
+            cur[1:] = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (cur < minv)
+            minv[better] = cur[better]
+            way[better] = j0
+            j1 = int(np.argmin(np.where(free, minv, np.inf)))
+            delta = minv[j1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    cols = np.full(n, -1, dtype=np.int64)
+    assigned = np.nonzero(p[1:])[0]
+    cols[p[1:][assigned] - 1] = assigned
+    return cols
+
+
+def chain_features(parents):
+    """Relative depth (0 at roots, 1 at the deepest bone) and child counts."""
+    n = len(parents)
+    depth = np.zeros(n)
+    for i in range(n):
+        j = parents[i]
+        while j >= 0:
+            depth[i] += 1
+            j = parents[j]
+    children = np.bincount(parents[parents >= 0], minlength=n)
+    return depth / max(depth.max(), 1.0), children
+
+
+def normalized_rest(arrays):
+    """Heads and tails in world orientation, centered, feet at 0, unit height."""
+    rot = arrays["matrix"][:3, :3]
+    rot = rot / np.linalg.norm(rot, axis=0)
+    head = arrays["head"] @ rot.T
+    tail = arrays["tail"] @ rot.T
+    pts = np.concatenate([head, tail])
+    lo, hi = pts.min(axis=0), pts.max(axis=0)
+    height = hi[2] - lo[2]
+    if height < 1e-6:
+        height = max((hi - lo).max(), 1e-6)
+    origin = np.array([(lo[0] + hi[0]) / 2, (lo[1] + hi[1]) / 2, lo[2]])
+    return (head - origin) / height, (tail - origin) / height
+
+
+def geometric_cost(imported, metarig, weights=GEO_WEIGHTS):
+    """Cost matrix imported bones x metarig bones."""
+    ih, it = normalized_rest(imported)
+    mh, mt = normalized_rest(metarig)
+    idepth, ichild = chain_features(imported["parents"])
+    mdepth, mchild = chain_features(metarig["parents"])
+
+    def directions(h, t):
+        d = t - h
+        return d / np.maximum(np.linalg.norm(d, axis=1, keepdims=True), 1e-9)
+
+    cost = (np.linalg.norm(ih[:, None] - mh[None], axis=2)
+            + np.linalg.norm(it[:, None] - mt[None], axis=2))
+    cost += weights["direction"] * (1.0 - directions(ih, it) @ directions(mh, mt).T)
+    cost += weights["depth"] * np.abs(idepth[:, None] - mdepth[None])
+    cost += weights["children"] * np.abs(
+        np.minimum(ichild, 3)[:, None] - np.minimum(mchild, 3)[None])
+
+    # bones clearly on opposite sides never match
+    imid = (ih[:, 0] + it[:, 0]) / 2
+    mmid = (mh[:, 0] + mt[:, 0]) / 2
+    side = np.sign(np.where(np.abs(imid) > 0.02, imid, 0))
+    mside = np.sign(np.where(np.abs(mmid) > 0.02, mmid, 0))
+    cost += weights["side"] * (side[:, None] * mside[None] < 0)
+    return cost
+
+
+def geometric_mapping(imported, metarig, base_mapping=None, max_cost=0.25):
+    """Mapping by rest pose geometry, in the format of bone_mapping.json.
+    With base_mapping (e.g. from the rule matcher) its mappable entries are
+    kept and only the remaining bones are matched."""
+    imp_names = imported["names"]
+    meta_names = metarig["names"]
+    base = {e["imported"]: e for e in base_mapping or ()}
+    fixed = {name for name, e in base.items() if e["category"] == "mappable"}
+    taken = {base[name]["rigify"] for name in fixed}
+
+    rows = [i for i, name in enumerate(imp_names) if name not in fixed]
+    cols = [j for j, name in enumerate(meta_names) if name not in taken]
+    matched = {}
+    if rows and cols:
+        cost = geometric_cost(imported, metarig)[np.ix_(rows, cols)]
+        if len(rows) <= len(cols):
+            pairs = [(r, c) for r, c in enumerate(linear_assignment(cost))]
+        else:
+            pairs = [(r, c) for c, r in enumerate(linear_assignment(cost.T))]
+        for r, c in pairs:
+            if c >= 0 and cost[r, c] <= max_cost:
+                matched[imp_names[rows[r]]] = (meta_names[cols[c]], cost[r, c])
+
+    mapping = []
+    used = set(taken)
+    for name in imp_names:
+        if name in fixed:
+            mapping.append(base[name])
+        elif name in matched:
+            target, c = matched[name]
+            mapping.append({"comment": f"geometry: cost {c:.3f}", "imported": name,
+                            "rigify": target, "category": "mappable"})
+            used.add(target)
+    for name in imp_names:
+        e = base.get(name)
+        if e is not None and name not in fixed and name not in matched:
+            if e["rigify"] in used:
+                mapping += extra_entries([name], used, e["comment"])
+            else:
+                used.add(e["rigify"])
+                mapping.append(e)
+    mapped = {e["imported"] for e in mapping}
+    mapping += extra_entries(
+        [name for name in imp_names if name not in mapped], used, "geometry: no match")
+    return mapping
+
+
+#  Chain resampling
+#
+# Where an imported chain has more segments than the Rigify chain it maps onto
+# (dropped bones between mapped ones), the Rigify segments are laid out along
+# the whole imported chain by arc length, keeping the metarig's length ratios.
+# Each source bone's weights are split over the targets by the share of its
+# arc each target covers, instead of dropping the bones in the middle.
+
+SPLIT_SKIP = {"cloth", "hair", "accessory"}
+
+
+def arc_params(points):
+    """Normalized arc length at every point of a polyline."""
+    c = np.concatenate([[0.0], np.cumsum(np.linalg.norm(np.diff(points, axis=0), axis=1))])
+    return c / max(c[-1], 1e-12)
+
+
+def interval_overlap(a, b):
+    """Overlap of the intervals a[k]..a[k+1] with b[j]..b[j+1]."""
+    lo = np.maximum(a[:-1, None], b[None, :-1])
+    hi = np.minimum(a[1:, None], b[None, 1:])
+    return np.clip(hi - lo, 0.0, None)
+
+
+def chain_resampling(mapping, imported, metarig):
+    """Chains of mapped bones with dropped bones in between, fitted by arc
+    length. Returns [{sources, targets, split, head, tail, roll}], split being
+    the sources x targets weight factors (rows sum to 1)."""
+    names = imported["names"]
+    imp_index = {name: i for i, name in enumerate(names)}
+    meta_index = {name: i for i, name in enumerate(metarig["names"])}
+    imp2rig = {e["imported"]: e["rigify"] for e in mapping
+               if e["category"] == "mappable"
+               and e["imported"] in imp_index and e["rigify"] in meta_index}
+    blocked = {e["imported"] for e in mapping if e["category"] in SPLIT_SKIP}
+    ipar = imported["parents"]
+    mpar = metarig["parents"]
+
+    # link mapped bones to their nearest mapped ancestor if their targets are
+    # a connected parent/child pair in the metarig
+    link = {}    # parent imported -> (child imported, bones in between)
+    linked = set()
+    for name, target in imp2rig.items():
+        t = meta_index[target]
+        if not metarig["connect"][t] or mpar[t] < 0:
+            continue
+        between = []
+        p = ipar[imp_index[name]]
+        while p >= 0 and names[p] not in imp2rig and names[p] not in blocked:
+            between.append(names[p])
+            p = ipar[p]
+        if p < 0 or names[p] not in imp2rig or names[p] in link:
+            continue
+        if imp2rig[names[p]] == metarig["names"][mpar[t]]:
+            link[names[p]] = (name, between[::-1])
+            linked.add(name)
+
+    chains = []
+    for start in link:
+        if start in linked:
+            continue
+        sources = [start]
+        targets = [imp2rig[start]]
+        cur = start
+        while cur in link:
+            cur, between = link[cur]
+            sources += between + [cur]
+            targets.append(imp2rig[cur])
+        if len(sources) == len(targets):
+            continue
+
+        src = [imp_index[s] for s in sources]
+        points = np.concatenate([imported["head"][src], imported["tail"][src[-1:]]])
+        c = arc_params(points)
+        tgt = [meta_index[t] for t in targets]
+        lengths = np.linalg.norm(metarig["tail"][tgt] - metarig["head"][tgt], axis=1)
+        d = np.concatenate([[0.0], np.cumsum(lengths)]) / max(lengths.sum(), 1e-12)
+
+        seg = np.diff(c)
+        split = interval_overlap(c, d)
+        zero = seg <= 1e-12
+        split[~zero] /= seg[~zero, None]
+        # zero length source bones go to the target at their position
+        split[zero] = 0.0
+        split[zero, np.clip(np.searchsorted(d, c[:-1][zero], side='right') - 1,
+                            0, len(targets) - 1)] = 1.0
+
+        at = np.stack([np.interp(d, c, points[:, k]) for k in range(3)], axis=1)
+        mid = np.clip(np.searchsorted(c, (d[:-1] + d[1:]) / 2) - 1, 0, len(src) - 1)
+        chains.append({
+            "sources": sources,
+            "targets": targets,
+            "split": split,
+            "head": at[:-1],
+            "tail": at[1:],
+            "roll": imported["roll"][src][mid],
+        })
+    return chains
+
+
+def chain_splits(chains, min_factor=1e-4):
+    """{imported: [(rigify, factor)]} for merge_plan, tiny shares dropped."""
+    splits = {}
+    for chain in chains:
+        for name, row in zip(chain["sources"], chain["split"]):
+            row = np.where(row >= min_factor, row, 0.0)
+            row /= row.sum()
+            splits[name] = [(t, float(f)) for t, f in zip(chain["targets"], row) if f > 0.0]
+    return splits
+
+
+#  Mapping checks
+
+def validate_mapping(mapping, imported_names, metarig_names):
+    """Consistency checks for a mapping. Returns the mapping without entries
+    for unknown imported bones and a list of problems that block applying it."""
+    problems = []
+
+    # "imported" and "rigify" must be unique
+    for key in ("imported", "rigify"):
+        counts = Counter(e[key] for e in mapping)
+        dupes = sorted(name for name, n in counts.items() if n > 1)
+        if dupes:
+            problems.append(f"'{key}' entries in mapping are not unique: {', '.join(dupes)}")
+
+    # drop entries whose imported bone isn't in imported_bones.json
+    clean_mapping = []
+    for e in mapping:
+        if e["imported"] not in imported_names:
+            log.info(f"Removing mapping for unknown imported bone '{e['imported']}'")
+            continue
+        clean_mapping.append(e)
+
+    # for "mappable", rigify must exist in metarig_bones.json
+    for e in clean_mapping:
+        if e["category"] == "mappable" and e["rigify"] not in metarig_names:
+            problems.append(f"Rigify bone '{e['rigify']}' not found in metarig_bones.json")
+
+    return clean_mapping, problems
+
+
 #  Operators
 
 class RBM_OT_ExportMetarigBones(Operator):
     """Export current metarig bone names to JSON"""
     bl_idname = "rbm.export_metarig"
     bl_label  = "Export Metarig Bones"
-    
+
     filepath: StringProperty(subtype="FILE_PATH")
-    
+
     def execute(self, context):
-        # fail if the blend file isn't saved
-        if not bpy.data.filepath:
-            self.report(
-                {'ERROR'}, "Please save your .blend file before scanning bones")
-            return {'CANCELLED'}
-        
         arm = context.object
-        names = [b.name for b in arm.data.bones]
-        names.sort()
-        
-        dir  = os.path.dirname(bpy.data.filepath) or os.getcwd()
-        path = bpy.path.ensure_ext(os.path.join(dir, "metarig_bones.json"), ".json")
-        with open(path, "w") as f:
-            json.dump(names, f, indent=2)
+        if arm is None or arm.type != 'ARMATURE':
+            self.report({'ERROR'}, "Active object is not an Armature")
+            return {'CANCELLED'}
+
+        path = scan_armature(arm, "metarig", sidecar_dir())
         self.report({'INFO'}, f"Metarig bone list → {path}")
         return {'FINISHED'}
 
@@ -64,314 +842,858 @@ class RBM_OT_ScanImportedBones(Operator):
     bl_label = "Scan Imported Rig"
 
     def execute(self, context):
-        # fail if the blend file isn't saved
-        if not bpy.data.filepath:
-            self.report(
-                {'ERROR'}, "Please save your .blend file before scanning bones")
-            return {'CANCELLED'}
-
         arm = context.object
-        if arm.type != 'ARMATURE':
+        if arm is None or arm.type != 'ARMATURE':
             self.report({'ERROR'}, "Active object is not an Armature")
             return {'CANCELLED'}
 
-        bones_info = []
-        for bone in arm.data.bones:
-            bones_info.append({
-                "name":   bone.name,
-                "parent": bone.parent.name if bone.parent else None
-            })
+        path = scan_armature(arm, "imported", sidecar_dir())
+        self.report({'INFO'}, f"Imported bones → {path}")
+        return {'FINISHED'}
+
+def build_prompt(meta_list, imp_list):
+    """Prompt asking for a mapping of imp_list onto the Rigify names in meta_list.
+    An empty meta_list asks for extra bones with names of their own."""
+    extras_hint = (
+        "The Rigify list is empty: none of these bones is mappable, give each "
+        "one of the additional categories and a Rigify style name.\n"
+        if not meta_list else ""
+    )
+    return (
+        "You are given two lists: the first is Rigify metarig bone names,"
+        "the second is bone names and their immediate parents from an imported rig.\n"
+        f"Rigify list: {json.dumps(meta_list)}\n"
+        f"Imported list: {json.dumps(imp_list)}\n\n"
+        "The bones need to be matched from the imported rig to rigify metarig names."
+        "Make sure each imported bone name is mapped at least with a category.\n"
+        "\n"
+        "Please Output a JSON array where each item is:\n"
+        "{\n"
+        '  "comment": <reasoning about this mapping if non-trivial and translation if non-English>,\n'
+        '  "imported": <name from Imported list>,\n'
+        '  "rigify": <Name from Rigify list if mappable, else see below>,\n'
+        '  "category": one of ["mappable","cloth","hair","accessory","IK","attach_point","non-human-body","unmappable"]\n'
+        "}\n"
+        "Additional hints for bone names:\n"
+        "- Finger 0 is the thumb in the ValveBiped rig.\n"
+        "- Accessory could also be a teddy bear that is worn.\n"
+        "- If encountered, Digit11 is the thumb and Digit21 is the index.\n"
+        "- When tail-alikes are attached to the head, let's assume braids (hair).\n"
+        "- If only one toe available on the foot, map it to the non-indexed toe.\n"
+        "- Don't correct 'lft' and 'rght' but keep them. These are assymetrical parts and this naming should prevent Blender from symmetrizing them."
+        "\n"
+        "If a name is not mappable, please convert the name to Rigify scheme (<meaningful name, don't repeat chain index here>.<number, if part of bone chain>.<L/R location>) "
+        'and place it in the "rigify" field. Don''t write a category as item/function, use an identifier from the imported bone.\n'
+        "An item has to be created for each imported bone name. Don't aggregate or skip symmetric parts.\n"
+        "attach_point is only for bones that can be very clearly identified as such, i.e. 'weapon_attach'.\n"
+        "Only map true homologues (e.g. thigh→thigh), do not map thigh→shin. "
+        "Mark extras as one of the additional categories. "
+        "Mark it as unmappable if it doesn't fit any of the other categories.\n"
+        'Only existing imported bones must be mentioned in the "imported" field.\n'
+        'If there are more segments in a chain (i.e. spine) than the Rigify rig has, preferrably keep the end segments and drop excess in the middle.\n'
+        + extras_hint
+    )
 
-        bones_info.sort(key=lambda e: e["name"])
 
-        directory = os.path.dirname(bpy.data.filepath)
-        filepath = bpy.path.ensure_ext(
-            os.path.join(directory, "imported_bones.json"),
-            ".json"
-        )
+#  LLM request
 
-        with open(filepath, "w") as f:
-            json.dump(bones_info, f, indent=2)
+OLLAMA_URL = "http://localhost:11434/api/generate"
+FENCE_RE = re.compile(r"```[a-zA-Z]*\s*(.*?)```", re.S)
+MAPPING_KEYS = ("imported", "rigify", "category")
+
+
+def is_mapping_list(value):
+    return bool(value) and isinstance(value, list) and all(
+        isinstance(e, dict) and all(k in e for k in MAPPING_KEYS) for e in value)
+
+
+def extract_json_array(text):
+    """First JSON array of mapping items in a model response, with or without
+    ``` fences and chatter around it. Other arrays, like "pick from [1, 2]",
+    are skipped."""
+    decoder = json.JSONDecoder()
+    candidates = [m.group(1) for m in FENCE_RE.finditer(text)] + [text]
+    for candidate in candidates:
+        pos = candidate.find("[")
+        while pos != -1:
+            try:
+                value, _ = decoder.raw_decode(candidate, pos)
+            except ValueError:
+                pass
+            else:
+                if is_mapping_list(value):
+                    return value
+            pos = candidate.find("[", pos + 1)
+    raise ValueError("No JSON array of mapping items found in the response")
+
+
+class LLMRequest(threading.Thread):
+    """Streams one Ollama style generate request in a worker thread.
+    The main thread polls text/error and sets cancelled to abort."""
+
+    def __init__(self, url, payload):
+        super().__init__(daemon=True)
+        self.url = url
+        self.payload = dict(payload, stream=True)
+        self.parts = []
+        self.error = None
+        self.cancelled = threading.Event()
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    def run(self):
+        try:
+            with requests.post(self.url, json=self.payload, stream=True, timeout=(5, 600)) as res:
+                if res.status_code != 200:
+                    self.error = f"LLM request failed [{res.status_code}]: {res.text[:200]}"
+                    return
+                for line in res.iter_lines():
+                    if self.cancelled.is_set():
+                        return
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        self.error = f"LLM error: {chunk['error']}"
+                        return
+                    self.parts.append(chunk.get("response", ""))
+                    if chunk.get("done"):
+                        break
+        except (requests.RequestException, ValueError) as e:
+            self.error = f"LLM request failed: {e}"
+
+
+#  Chunked requests
+#
+# Big rigs are sent as several smaller prompts, one per body region, each with
+# only the Rigify names that region can map to. Regions come from the rule
+# matcher's name features; bones without a body part follow their parent.
+
+PART_REGIONS = {
+    "hips": "spine", "spine": "spine", "neck": "spine", "breast": "spine",
+    "clavicle": "arms", "upperarm": "arms", "forearm": "arms", "hand": "arms",
+    "finger": "fingers",
+    "thigh": "legs", "shin": "legs", "foot": "legs", "toe": "legs",
+    "head": "head", "eye": "head", "jaw": "head",
+}
+REGION_META_PREFIXES = {
+    "spine": ("spine", "pelvis", "breast"),
+    "arms": ("shoulder", "upper_arm", "forearm", "hand"),
+    "fingers": ("thumb", "f_index", "f_middle", "f_ring", "f_pinky", "palm"),
+    "legs": ("pelvis", "thigh", "shin", "foot", "toe", "heel"),
+    "head": ("spine.004", "spine.005", "spine.006", "face", "nose", "lip", "jaw",
+             "chin", "ear", "tongue", "teeth", "brow", "lid", "eye", "cheek",
+             "forehead", "temple"),
+    # no metarig names: extras get names of their own instead of competing
+    # with the spine chunk for spine targets
+    "extras": (),
+}
+
+
+def bone_regions(imp_list):
+    """{bone name: region} for the chunks of a chunked request."""
+    parents = {b["name"]: b["parent"] for b in imp_list}
+    regions = {}
+
+    def region(name):
+        if name not in regions:
+            part, _, _, _, category, _ = bone_features(name)
+            if part:
+                regions[name] = PART_REGIONS[part]
+            elif category and category != "unmappable":
+                regions[name] = "extras"
+            elif parents.get(name) in parents:
+                regions[name] = region(parents[name])
+            else:
+                regions[name] = "extras"
+        return regions[name]
+
+    for name in parents:
+        region(name)
+    return regions
+
+
+def split_bone_chunks(imp_list, meta_list, max_bones):
+    """[(label, imported subset, metarig subset)], no chunk above max_bones."""
+    regions = bone_regions(imp_list)
+    chunks = []
+    for region, prefixes in REGION_META_PREFIXES.items():
+        bones = [b for b in imp_list if regions[b["name"]] == region]
+        meta = [n for n in meta_list if n.startswith(prefixes)]
+        for i in range(0, len(bones), max_bones):
+            part = bones[i:i + max_bones]
+            label = region if len(bones) <= max_bones else f"{region} {i // max_bones + 1}"
+            chunks.append((label, part, meta))
+    return chunks
+
+
+def merge_chunk_mappings(results):
+    """Concatenate chunk answers, the first entry for an imported bone wins.
+    Malformed items are dropped."""
+    merged = []
+    seen = set()
+    for mapping in results:
+        for e in mapping:
+            if not isinstance(e, dict) or not all(isinstance(e.get(k), str) for k in MAPPING_KEYS):
+                log.warning(f"Dropping malformed mapping item {e!r}")
+                continue
+            if e["imported"] in seen:
+                continue
+            seen.add(e["imported"])
+            merged.append(e)
+    return merged
 
-        self.report({'INFO'}, f"Imported bones → {filepath}")
-        return {'FINISHED'}
 
 class RBM_OT_CallLLMMap(Operator):
-    """Call local Ollama to generate a mapping JSON"""
+    """Call local Ollama to generate a mapping JSON. Runs in the background, Esc cancels"""
     bl_idname = "rbm.call_llm"
     bl_label  = "Generate Mapping via LLM"
-    
+
+    url: StringProperty(
+        name="URL",
+        default=OLLAMA_URL,
+        description="Ollama compatible generate endpoint"
+    )
+    model: StringProperty(
+        name="Model",
+        default="mistral-nemo",    # or another local 12B model
+    )
+    chunk_size: IntProperty(
+        name="Chunk Size",
+        default=60,
+        min=0,
+        description="Rigs with more bones are split into body regions, one request each. 0 sends a single prompt"
+    )
+    max_parallel: IntProperty(
+        name="Parallel Requests",
+        default=2,
+        min=1,
+        description="Chunk requests running at the same time, match OLLAMA_NUM_PARALLEL"
+    )
+    use_cache: BoolProperty(
+        name="Use Cache",
+        default=True,
+        description="Reuse the mapping applied before to a rig with the same bone list "
+                    "instead of asking the LLM"
+    )
+    use_mock: BoolProperty(
+        name="Local Stand-in",
+        default=False,
+        options={'HIDDEN'},
+        description="Development only: answer from the local stand-in server in _llm_mock.py, "
+                    "fed by the rule matcher"
+    )
+
+    _timer = None
+
     def execute(self, context):
-        dir = os.path.dirname(bpy.data.filepath) or os.getcwd()
-        with open(os.path.join(dir, "metarig_bones.json")) as f:
-            meta_list = json.load(f)
-        with open(os.path.join(dir, "imported_bones.json")) as f:
-            imp_list = json.load(f)
-            
-        # craft prompt embedding the two lists
-        prompt = (
-            "You are given two lists: the first is Rigify metarig bone names,"
-            "the second is bone names and their immediate parents from an imported rig.\n"
-            f"Rigify list: {meta_list}\n"
-            f"Imported list: {imp_list}\n\n"
-            "The bones need to be matched from the imported rig to rigify metarig names."
-            "Make sure each imported bone name is mapped at least with a category.\n"
-            "\n"
-            "Please Output a JSON array where each item is:\n"
-            "{\n"
-            '  "comment": <reasoning about this mapping if non-trivial and translation if non-English>,\n'
-            '  "imported": <name from Imported list>,\n'
-            '  "rigify": <Name from Rigify list if mappable, else see below>,\n'
-            '  "category": one of ["mappable","cloth","hair","accessory","IK","attach_point","non-human-body","unmappable"]\n'
-            "}\n"
-            "Additional hints for bone names:\n"
-            "- Finger 0 is the thumb in the ValveBiped rig.\n"
-            "- Accessory could also be a teddy bear that is worn.\n"
-            "- If encountered, Digit11 is the thumb and Digit21 is the index.\n"
-            "- When tail-alikes are attached to the head, let's assume braids (hair).\n"
-            "- If only one toe available on the foot, map it to the non-indexed toe.\n"
-            "- Don't correct 'lft' and 'rght' but keep them. These are assymetrical parts and this naming should prevent Blender from symmetrizing them."
-            "\n"
-            "If a name is not mappable, please convert the name to Rigify scheme (<meaningful name, don't repeat chain index here>.<number, if part of bone chain>.<L/R location>) "
-            'and place it in the "rigify" field. Don''t write a category as item/function, use an identifier from the imported bone.\n'
-            "An item has to be created for each imported bone name. Don't aggregate or skip symmetric parts.\n"
-            "attach_point is only for bones that can be very clearly identified as such, i.e. 'weapon_attach'.\n"
-            "Only map true homologues (e.g. thigh→thigh), do not map thigh→shin. "
-            "Mark extras as one of the additional categories. "
-            "Mark it as unmappable if it doesn't fit any of the other categories.\n"
-            'Only existing imported bones must be mentioned in the "imported" field.\n'
-            'If there are more segments in a chain (i.e. spine) than the Rigify rig has, preferrably keep the end segments and drop excess in the middle.\n'
-        )
-        # dump prompt for debugging
-        with open(os.path.join(dir, "bone_mapping_prompt.txt"), "w", encoding="utf-8") as pf:
-            _ = pf.write(prompt)
-        return {'CANCELLED'}
-    
-        # build and send request
-        payload = {
-            "model": "mistral-nemo",    # or another local 12B model
-            "prompt": prompt,
-            "stream": False,
-            "temperature": 0.2,
-        }
-        print(f"Request posted")
-        res = requests.post("http://localhost:11434/api/generate", json=payload)
-        print(f"API response: {res.status_code}")
-        
-        # dump raw response for debugging
-        with open(os.path.join(dir, "bone_mapping_raw.txt"), "w", encoding="utf-8") as rf:
-            _ = rf.write(f"Status: {res.status_code}\n\n")
-            _ = rf.write(res.text)
-        
-        # handle errors
-        if res.status_code != 200:
-            self.report(
-                {'ERROR'},
-                f"LLM request failed [{res.status_code}]: {res.text[:200]}"
-            )
+        dir = sidecar_dir()
+        try:
+            meta_list, imp_list = load_bone_lists(dir)
+        except (OSError, ValueError) as e:
+            self.report({'ERROR'}, f"Failed to read bone lists: {e}")
             return {'CANCELLED'}
-        
-        # parse the JSON safely
+
+        # a rig with the same bone list was mapped before
+        cached = load_cached_mapping(imp_list) if self.use_cache else None
+        if cached is not None:
+            outpath = write_mapping(dir, cached)
+            self.report({'INFO'}, f"Cached mapping JSON → {outpath}")
+            return {'FINISHED'}
+
+        if self.chunk_size and len(imp_list) > self.chunk_size:
+            chunks = split_bone_chunks(imp_list, meta_list, self.chunk_size)
+        else:
+            chunks = [("all", imp_list, meta_list)]
+        prompts = [(label, build_prompt(meta, bones)) for label, bones, meta in chunks]
+
+        # dump prompts for debugging
+        if dir:
+            with open(os.path.join(dir, "bone_mapping_prompt.txt"), "w", encoding="utf-8") as pf:
+                for label, prompt in prompts:
+                    _ = pf.write(f"### {label}\n{prompt}\n" if len(prompts) > 1 else prompt)
+
+        self._url = self.url
+        if self.use_mock:
+            from . import _llm_mock
+            self._url = _llm_mock.start_mock_server(rule_based_mapping(imp_list, set(meta_list)))
+
+        self._dir = dir
+        self._meta_list = meta_list
+        self._imp_list = imp_list
+        self._pending = prompts
+        self._workers = []
+        self.start_requests()
+        log.info(f"LLM mapping: {len(prompts)} request(s) to {self._url}")
+
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.2, window=context.window)
+        wm.progress_begin(0, 100)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def start_requests(self):
+        running = sum(1 for _, w in self._workers if w.is_alive())
+        while self._pending and running < self.max_parallel:
+            label, prompt = self._pending.pop(0)
+            payload = {
+                "model": self.model,
+                "prompt": prompt,
+                "options": {"temperature": 0.2},
+            }
+            worker = LLMRequest(self._url, payload)
+            worker.start()
+            self._workers.append((label, worker))
+            running += 1
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            for _, worker in self._workers:
+                worker.cancelled.set()
+            self.finish(context)
+            self.report({'WARNING'}, "LLM mapping cancelled")
+            return {'CANCELLED'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        self.start_requests()
+
+        # progress: mapping items streamed so far
+        items = sum(w.text.count('"imported"') for _, w in self._workers)
+        expected = len(self._imp_list)
+        finished = sum(1 for _, w in self._workers if not w.is_alive())
+        total = finished + len(self._pending) + sum(1 for _, w in self._workers if w.is_alive())
+        context.window_manager.progress_update(min(99, 100 * items // max(1, expected)))
+        context.workspace.status_text_set(
+            f"LLM mapping: {items}/{expected} bones, {finished}/{total} requests  (Esc to cancel)")
+        if self._pending or any(w.is_alive() for _, w in self._workers):
+            return {'PASS_THROUGH'}
+
+        self.finish(context)
+        return self.store_result()
+
+    def finish(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+        if self.use_mock:
+            from . import _llm_mock
+            _llm_mock.stop_mock_server()
+
+    def store_result(self):
+        # dump raw responses for debugging
+        if self._dir:
+            with open(os.path.join(self._dir, "bone_mapping_raw.txt"), "w", encoding="utf-8") as rf:
+                for label, worker in self._workers:
+                    _ = rf.write(f"### {label}\n{worker.text}\n" if len(self._workers) > 1 else worker.text)
+
+        results = []
+        for label, worker in self._workers:
+            if worker.error:
+                self.report({'ERROR'}, f"[{label}] {worker.error}")
+                return {'CANCELLED'}
+            try:
+                results.append(extract_json_array(worker.text))
+            except ValueError as e:
+                self.report({'ERROR'}, f"[{label}] {e}: {worker.text[:200]}")
+                return {'CANCELLED'}
+
+        mapping = merge_chunk_mappings(results)
+        mapping, problems = validate_mapping(
+            mapping, {b["name"] for b in self._imp_list}, set(self._meta_list))
+        missing = len(self._imp_list) - len({e["imported"] for e in mapping})
+
+        outpath = write_mapping(self._dir, mapping)
+        for problem in problems:
+            log.warning(problem)
+        if problems or missing:
+            self.report(
+                {'WARNING'},
+                f"Mapping JSON → {outpath}, {missing} bones unmapped, {len(problems)} problems"
+                + (f": {problems[0]}" if problems else ""))
+        else:
+            self.report({'INFO'}, f"Mapping JSON → {outpath}")
+        return {'FINISHED'}
+
+
+class RBM_OT_RuleMap(Operator):
+    """Generate a mapping JSON from naming rules (ValveBiped, Mixamo, DAZ, UE)"""
+    bl_idname = "rbm.rule_map"
+    bl_label = "Generate Mapping via Rules"
+
+    use_cache: BoolProperty(
+        name="Use Cache",
+        default=True,
+        description="Reuse the mapping applied before to a rig with the same bone list"
+    )
+
+    def execute(self, context):
+        dir = sidecar_dir()
         try:
-            data = res.json()
-        except ValueError:
+            meta_list, imp_list = load_bone_lists(dir)
+        except (OSError, ValueError) as e:
+            self.report({'ERROR'}, f"Failed to read bone lists: {e}")
+            return {'CANCELLED'}
+
+        mapping = load_cached_mapping(imp_list) if self.use_cache else None
+        source = "cache"
+        if mapping is None:
+            mapping = rule_based_mapping(imp_list, set(meta_list))
+            source = "rules"
+
+        outpath = write_mapping(dir, mapping)
+        mapped = sum(1 for e in mapping if e["category"] == "mappable")
+        self.report(
+            {'INFO'}, f"Mapping JSON ({source}, {mapped}/{len(mapping)} mappable) → {outpath}")
+        return {'FINISHED'}
+
+
+class RBM_OT_GeometryMap(Operator):
+    """Generate a mapping JSON by matching the rest pose geometry of the scanned rigs"""
+    bl_idname = "rbm.geometry_map"
+    bl_label = "Generate Mapping via Geometry"
+
+    use_rules: BoolProperty(
+        name="Use Names",
+        default=True,
+        description="Keep the bones the naming rules map, match only the rest by geometry"
+    )
+    max_cost: FloatProperty(
+        name="Max Cost",
+        default=0.25,
+        min=0.0,
+        description="Pairs above this cost (in rig heights) are not mapped"
+    )
+
+    def execute(self, context):
+        dir = sidecar_dir()
+        bundle = load_bundle()
+        if not bundle or not bundle.get("imported") or not bundle.get("metarig"):
             self.report(
-                {'ERROR'},
-                "Server returned invalid JSON: " + res.text[:200]
-            )
+                {'ERROR'}, "Scan the imported rig and export the metarig bones first")
             return {'CANCELLED'}
-        
-        # extract the generated mapping
-        response = data["response"]
-        
-        
-        # TODO the model responds with "Here's a JSON array that ... ```json ... ```"
-        # We need to cut this part out
-        # Maybe we can also detect if a model directly responds with [ or {
-        
-        outpath = os.path.join(dir, "bone_mapping.json")
-        with open(outpath, "w") as f:
-            f.write(response)
-        self.report({'INFO'}, f"Mapping JSON → {outpath}")
+        imported = bundle["imported"]
+        metarig = bundle["metarig"]
+
+        base = None
+        if self.use_rules:
+            base = rule_based_mapping(bone_list(imported), set(metarig["names"]))
+        mapping = geometric_mapping(imported, metarig, base, self.max_cost)
+
+        outpath = write_mapping(dir, mapping)
+        mapped = sum(1 for e in mapping if e["category"] == "mappable")
+        self.report(
+            {'INFO'}, f"Mapping JSON (geometry, {mapped}/{len(mapping)} mappable) → {outpath}")
         return {'FINISHED'}
 
 
 def assign_bonegroup(arm_obj: bpy.types.Object, groupname: str, bone_names):
     """
     Creates/retrieves a bone collection (new in Blender 4.0) named groupname and
-    assigns the specified bones to it.
+    assigns the specified bones to it. Works in any mode.
     """
-    # ensure we're in POSE mode
-    bpy.ops.object.mode_set(mode='POSE')
     coll = arm_obj.data.collections.get(groupname)
     if not coll:
         coll = arm_obj.data.collections.new(groupname)
+    bones = {b.name: b for b in arm_obj.data.bones}
     for bn in bone_names:
-        bone = arm_obj.data.bones.get(bn)
+        bone = bones.get(bn)
         if bone:
             coll.assign(bone)
 
 
+def rig_problems(mapping, metarig_obj, imported_obj=None):
+    """Mapping entries missing from the armatures they are applied to."""
+    meta_names = {b.name for b in metarig_obj.data.bones}
+    imp_names = {b.name for b in imported_obj.data.bones} if imported_obj else None
+    problems = []
+    for e in mapping:
+        if imp_names is not None and e["imported"] not in imp_names:
+            problems.append(f"Imported bone '{e['imported']}' not in '{imported_obj.name}'")
+        if e["category"] == "mappable" and e["rigify"] not in meta_names:
+            problems.append(f"Rigify bone '{e['rigify']}' not in '{metarig_obj.name}'")
+    return problems
+
+
+# categories apply_mapping() adds bones for, besides the mapped ones
+EXTRA_BONE_CATEGORIES = {"cloth", "hair", "accessory"}
+
+
+def created_bones(mapping):
+    """{imported: rigify} of the entries apply_mapping() turns into bones;
+    the other categories get no bone on the Rigify side."""
+    return {e["imported"]: e["rigify"] for e in mapping
+            if e["category"] == "mappable" or e["category"] in EXTRA_BONE_CATEGORIES}
+
+
+def apply_mapping(context, metarig_obj, mapping, imported=None, imported_obj=None,
+                  metarig=None, resample=True):
+    """Move the metarig bones onto the imported rig and add the extra bones of
+    a validated mapping. Rest transforms come from the bundled arrays
+    `imported`, else from the edit bones of imported_obj. With the bundled
+    `metarig` arrays and resample, chains with dropped bones are resampled.
+    Returns (mapped, created, chains) counts."""
+    imp2rig = {e["imported"]: e["rigify"] for e in mapping}
+    # category → [bone_names] for the pose pass
+    super_copy_map = defaultdict(list)
+
+    # 1. Edit pass (multi object edit if both armatures, metarig active)
+    if context.object is not None and context.object.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    arms = [metarig_obj] if imported is not None else [metarig_obj, imported_obj]
+    for o in arms:
+        o.select_set(True)
+    context.view_layer.objects.active = metarig_obj
+    bpy.ops.object.mode_set(mode='EDIT')
+    meta_editbones = metarig_obj.data.edit_bones
+    meta_eb = {eb.name: eb for eb in meta_editbones}
+
+    # rest transform of an imported bone: (head, tail, roll, use_connect)
+    if imported is not None:
+        names = imported["names"]
+        imported_parent = {name: names[p] if p >= 0 else None
+                           for name, p in zip(names, imported["parents"].tolist())}
+        rest = {name: (imported["head"][i], imported["tail"][i],
+                       float(imported["roll"][i]), bool(imported["connect"][i]))
+                for i, name in enumerate(names)}
+    else:
+        imported_parent = {eb.name: eb.parent.name if eb.parent else None
+                           for eb in imported_obj.data.edit_bones}
+        rest = {eb.name: (eb.head, eb.tail, eb.roll, eb.use_connect)
+                for eb in imported_obj.data.edit_bones}
+
+    created = []
+    for e in mapping:
+        imp_name = e["imported"]
+        rig_name = e["rigify"]
+        cat = e["category"]
+
+        if cat == "mappable":
+            eb = meta_eb[rig_name]
+        elif cat in EXTRA_BONE_CATEGORIES:
+            eb = meta_eb.get(rig_name)
+            if eb is None:
+                eb = meta_eb[rig_name] = meta_editbones.new(rig_name)
+            created.append(e)
+            super_copy_map[cat].append(rig_name)
+        else:
+            log.debug(f"Ignoring mapping '{imp_name}' category '{cat}'")
+            continue
+
+        # Copy rest-pose transform
+        eb.head, eb.tail, eb.roll, _ = rest[imp_name]
+        log.debug(f"Mapped '{imp_name}' -> '{rig_name}'")
+
+    # chains with dropped bones follow the whole imported chain
+    chains = []
+    if resample and imported is not None and metarig is not None:
+        chains = chain_resampling(mapping, imported, metarig)
+    for chain in chains:
+        for j, target in enumerate(chain["targets"]):
+            eb = meta_eb[target]
+            eb.head = chain["head"][j]
+            eb.tail = chain["tail"][j]
+            eb.roll = float(chain["roll"][j])
+        log.info(f"Resampled {len(chain['sources'])} imported bones onto "
+                 f"{len(chain['targets'])} Rigify bones from '{chain['targets'][0]}'")
+
+    # parent new bones once all of them exist
+    for e in created:
+        eb = meta_eb[e["rigify"]]
+        eb.use_connect = False
+        par_rig = imp2rig.get(imported_parent.get(e["imported"]))
+        if par_rig in meta_eb:
+            eb.parent = meta_eb[par_rig]
+            eb.use_connect = rest[e["imported"]][3]
+
+    bpy.ops.object.mode_set(mode='OBJECT')
+
+    # 2. Pose pass: rigify_type and bone collections, no mode switch needed
+    pose_bones = {pb.name: pb for pb in metarig_obj.pose.bones}
+    for category, bones in super_copy_map.items():
+        for bn in bones:
+            pb = pose_bones.get(bn)
+            if pb:
+                pb.rigify_type = "basic.super_copy"
+        # assign to bone‐group named after category
+        assign_bonegroup(metarig_obj, category.capitalize(), bones)
+
+    mapped = sum(1 for e in mapping if e["category"] == "mappable")
+    return mapped, len(created), len(chains)
+
+
 class RBM_OT_ApplyMapping(Operator):
     """Read bone_mapping.json, rename & reposition bones accordingly."""
     bl_idname = "rbm.apply_mapping"
     bl_label = "Apply Bone Mapping"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    resample_chains: BoolProperty(
+        name="Resample Chains",
+        default=True,
+        description="Spread Rigify chains over imported chains with dropped bones by arc length (needs scanned rigs)"
+    )
 
     def execute(self, context):
         log.info("RBM_OT_ApplyMapping called")
 
-        # 1. Load JSON files
-        blend_dir = os.path.dirname(bpy.data.filepath) or os.getcwd()
-        mapping_path = os.path.join(blend_dir, "bone_mapping.json")
-        metarig_path = bpy.path.ensure_ext(
-            os.path.join(blend_dir, "metarig_bones"), ".json")
-        imported_path = bpy.path.ensure_ext(
-            os.path.join(blend_dir, "imported_bones"), ".json")
-
+        # 1. Load mapping and bone lists, bundled or from the JSON files
+        blend_dir = sidecar_dir()
         try:
-            mapping = json.load(open(mapping_path, "r"))
-            metarig_bones = set(json.load(open(metarig_path, "r")))
-            imported_bones_data = json.load(open(imported_path, "r"))
-            imported_bone_names = {b["name"] for b in imported_bones_data}
-        except Exception as e:
+            mapping = load_mapping(blend_dir)
+            meta_list, imported_bones_data = load_bone_lists(blend_dir)
+        except (OSError, ValueError) as e:
             self.report({'ERROR'}, f"Failed to read JSON files: {e}")
             return {'CANCELLED'}
+        metarig_bones = set(meta_list)
+        imported_bone_names = {b["name"] for b in imported_bones_data}
 
-        # 2. Consistency checks
+        # bundled rest geometry of the imported rig, if it matches the bone list
+        bundle = load_bundle()
+        imported = bundle.get("imported") if bundle else None
+        if imported is not None and set(imported["names"]) != imported_bone_names:
+            imported = None
 
-        # 2.1 "imported" must be unique
-        imported_list = [e["imported"] for e in mapping]
-        if len(imported_list) != len(set(imported_list)):
+        # 2. Find the selected armatures: metarig, plus the imported rig
+        #    unless its rest geometry is bundled
+        arms = [o for o in context.selected_objects if o.type == 'ARMATURE']
+        if len(arms) != 2 and not (imported is not None and len(arms) == 1):
             self.report(
-                {'ERROR'}, "'imported' entries in mapping are not unique.")
+                {'ERROR'}, "Select exactly two armatures (imported rig + Rigify metarig).")
             return {'CANCELLED'}
 
-        # 2.2 "rigify" must be unique
-        rigify_list = [e["rigify"] for e in mapping]
-        if len(rigify_list) != len(set(rigify_list)):
+        # Metarig is the one matching more metarig bone names
+        arm_names = {arm: {b.name for b in arm.data.bones} for arm in arms}
+        metarig_obj = max(arms, key=lambda a: len(arm_names[a] & metarig_bones)
+                          - len(arm_names[a] & imported_bone_names))
+        imported_obj = next((a for a in arms if a is not metarig_obj), None)
+
+        # 3. Consistency checks, all problems at once
+        mapping, problems = validate_mapping(
+            mapping, imported_bone_names, metarig_bones)
+        problems += rig_problems(
+            mapping, metarig_obj, imported_obj if imported is None else None)
+        if problems:
+            for problem in problems:
+                log.error(problem)
             self.report(
-                {'ERROR'}, "'rigify' entries in mapping are not unique.")
+                {'ERROR'}, f"{len(problems)} problems in bone_mapping.json:\n" + "\n".join(problems))
             return {'CANCELLED'}
 
-        # 2.3 Remove entries whose imported bone isn't in imported_bones.json
-        clean_mapping = []
-        for e in mapping:
-            if e["imported"] not in imported_bone_names:
-                log.info(
-                    f"Removing mapping for unknown imported bone '{e['imported']}'")
-                continue
-            clean_mapping.append(e)
-        mapping = clean_mapping
+        # 4. Edit and pose pass
+        mapped, created, chains = apply_mapping(
+            context, metarig_obj, mapping, imported, imported_obj,
+            bundle.get("metarig") if bundle else None, self.resample_chains)
 
-        # 2.4 For "mappable", rigify must exist in metarig_bones.json
-        for e in mapping:
-            if e["category"] == "mappable" and e["rigify"] not in metarig_bones:
-                self.report({'ERROR'},
-                            f"Rigify bone '{e['rigify']}' not found in metarig_bones.json")
-                return {'CANCELLED'}
+        # 5. Remember the mapping for rigs with the same bone list
+        try:
+            store_cached_mapping(imported_bones_data, mapping)
+        except OSError:
+            log.warning("Could not store mapping cache", exc_info=True)
 
-        # 3. Find the two selected armatures: imported rig and metarig
-        arms = [o for o in context.selected_objects if o.type == 'ARMATURE']
-        if len(arms) != 2:
-            self.report(
-                {'ERROR'}, "Select exactly two armatures (imported rig + Rigify metarig).")
-            return {'CANCELLED'}
+        self.report(
+            {'INFO'}, f"Bone mapping applied: {mapped} mapped, {created} extra bones, "
+            f"{chains} chains resampled.")
+        return {'FINISHED'}
 
-        # Assign by matching bone names
-        def score_match(obj, names):
-            return len({b.name for b in obj.data.bones}.intersection(names))
 
-        # Imported rig will match imported_bone_names
-        scores = [(arm, score_match(arm, imported_bone_names)) for arm in arms]
-        imported_obj = max(scores, key=lambda x: x[1])[0]
-        metarig_obj = [a for a in arms if a != imported_obj][0]
+#  Vertex group merge
+#
+# Weights of a mesh are read once into sparse (vertex, group, weight) arrays.
+# Source groups are summed into their target groups per the mapping, the
+# targets renormalized, and only groups whose content changed are rewritten.
 
-        # 4. Switch to Edit Mode on metarig (must be active)
-        bpy.ops.object.mode_set(mode='OBJECT')
-        for o in arms:
-            o.select_set(True)
-        context.view_layer.objects.active = metarig_obj
-        bpy.ops.object.mode_set(mode='EDIT')
-        meta_editbones = metarig_obj.data.edit_bones
-        imp_bones = imported_obj.data.edit_bones
-
-        # Build parent lookup for imported bones
-        imported_parent = {b["name"]: b["parent"] for b in imported_bones_data}
-
-        # Build map from imported->rigify for parenting new bones
-        imp2rig = {e["imported"]: e["rigify"] for e in mapping}
-        
-        # prepare a dict of category → [bone_names] for later grouping
-        super_copy_map = defaultdict(list)
-
-        # 5. Apply mapping
-        for e in mapping:
-            imp_name = e["imported"]
-            rig_name = e["rigify"]
-            cat = e["category"]
-
-            if cat == "mappable":
-                eb = meta_editbones[rig_name]
-                ib = imp_bones[imp_name]
-                # Copy rest-pose transform: head/tail/local matrix
-                eb.head = ib.head.copy()
-                eb.tail = ib.tail.copy()
-                eb.roll = ib.roll
-                eb.length = ib.length
-                log.info(f"Mapped '{imp_name}' -> '{rig_name}'")
-
-            elif cat in {"cloth", "hair", "accessory"}:
-                ib = imp_bones[imp_name]
-                if rig_name in meta_editbones:
-                    nb = meta_editbones[rig_name]
-                else:
-                    nb = meta_editbones.new(rig_name)
-                nb.head = ib.head.copy()
-                nb.tail = ib.tail.copy()
-                nb.roll = ib.roll
-                nb.length = ib.length
-                nb.use_connect = ib.use_connect
-
-                # Set parent if possible
-                par_imp = imported_parent.get(imp_name)
-                par_rig = imp2rig.get(par_imp)
-                if par_rig and par_rig in meta_editbones:
-                    nb.parent = meta_editbones[par_rig]
-                    
-                # mark for super_copy rigify_type assignment
-                super_copy_map[cat].append(rig_name)
-            else:
-                log.info(f"Ignoring mapping '{imp_name}' category '{cat}'")
+# written weights are quantized to this many steps, which bounds the number
+# of VertexGroup.add() calls per group
+WEIGHT_STEPS = 4096
 
-        # 6. Return to OBJECT mode
-        bpy.ops.object.mode_set(mode='OBJECT')
-        
-        # 7. Assign rigify_type in Pose Mode
-        if super_copy_map:
-            context.view_layer.objects.active = metarig_obj
-            bpy.ops.object.mode_set(mode='POSE')
-            
-            for category, bones in super_copy_map.items():
-                for bn in bones:
-                    pb = metarig_obj.pose.bones.get(bn)
-                    if not pb:
-                        continue
 
-                    # set rigify_type
-                    pb.rigify_type = "basic.super_copy"
-                    log.info(f"Assigned super_copy to pose bone '{bn}'")
+def read_vertex_weights(me):
+    """(verts, groups, weights) arrays of all weights > 0, in vertex order.
+    Blender has no bulk accessor for vertex group weights across vertices,
+    so this still loops once per vertex, with one foreach_get per field."""
+    memberships = [v.groups for v in me.vertices]
+    counts = np.fromiter(map(len, memberships), dtype=np.int64, count=len(memberships))
+    ends = np.cumsum(counts)
+    groups = np.empty(int(ends[-1]) if len(ends) else 0, dtype=np.int32)
+    weights = np.empty(len(groups), dtype=np.float32)
+    for elems, start, end in zip(memberships, (ends - counts).tolist(), ends.tolist()):
+        if start != end:
+            elems.foreach_get('group', groups[start:end])
+            elems.foreach_get('weight', weights[start:end])
+    verts = np.repeat(np.arange(len(counts)), counts)
+    keep = weights > 0.0
+    return (verts[keep], groups[keep].astype(np.int64),
+            weights[keep].astype(np.float64))
 
-                # assign to bone‐group named after category
-                assign_bonegroup(metarig_obj, category.capitalize(), bones)
-             
-            bpy.ops.object.mode_set(mode='OBJECT')
 
-        self.report({'INFO'}, "Bone mapping applied successfully.")
-        return {'FINISHED'}
+def merge_plan(group_names, imp2rig, imported_parent, prefix, merge_unmapped=True,
+               splits=None):
+    """{group index: [(target group name, factor)]} for the groups of one object.
+    Groups of bones in splits ({imported: [(rigify, factor)]}, see
+    chain_resampling) spread over several targets. Groups of imported bones
+    missing from imp2rig fold into their nearest mapped ancestor if
+    merge_unmapped; groups already named like a target are merged into it.
+    Other groups stay untouched."""
+    splits = splits or {}
+    plan = {}
+    for index, name in enumerate(group_names):
+        if name in splits:
+            plan[index] = [(prefix + target, f) for target, f in splits[name]]
+            continue
+        bone = name
+        if merge_unmapped:
+            while bone in imported_parent and bone not in imp2rig and bone not in splits:
+                bone = imported_parent[bone]
+        if bone in splits:
+            plan[index] = [(prefix + target, f) for target, f in splits[bone]]
+        elif bone in imp2rig:
+            plan[index] = [(prefix + imp2rig[bone], 1.0)]
+    targets = {target for entries in plan.values() for target, _ in entries}
+    for index, name in enumerate(group_names):
+        if index not in plan and name in targets:
+            plan[index] = [(name, 1.0)]
+    return plan
+
+
+def write_group_weights(vg, verts, weights):
+    """Bulk write, one add() call per distinct weight step (at most
+    WEIGHT_STEPS + 1 calls)."""
+    weights = np.round(weights * WEIGHT_STEPS) / WEIGHT_STEPS
+    values, inverse, counts = np.unique(weights, return_inverse=True, return_counts=True)
+    order = np.argsort(inverse, kind='stable')
+    for value, members in zip(values, np.split(verts[order], np.cumsum(counts)[:-1])):
+        vg.add(members.tolist(), float(value), 'REPLACE')
+
+
+def merge_vertex_groups(obj, plan, normalize=True, deform=None):
+    """Blend source groups into target groups per plan (weight x factor, summed),
+    renormalize the targets and remove obsolete groups. Normalizing scales
+    the targets so all deform weights of a vertex sum to 1, the weights of
+    untouched groups named in deform (all untouched groups if None) kept as
+    they are. Returns (rewritten, renamed, removed) counts."""
+    me = obj.data
+    n = len(me.vertices)
+    vgroups = list(obj.vertex_groups)
+    targets = sorted({target for entries in plan.values() for target, _ in entries})
+    target_col = {name: i for i, name in enumerate(targets)}
+    sources = defaultdict(list)
+    for index, entries in plan.items():
+        for name, f in entries:
+            sources[name].append((index, f))
+
+    # plan edges sorted by source group, as CSR over the groups
+    edges = sorted((index, target_col[name], f)
+                   for index, entries in plan.items() for name, f in entries)
+    edge_col = np.array([e[1] for e in edges], dtype=np.int64)
+    edge_factor = np.array([e[2] for e in edges], dtype=np.float64)
+    edge_count = np.bincount(np.array([e[0] for e in edges], dtype=np.int64),
+                             minlength=len(vgroups))
+    edge_start = np.cumsum(edge_count) - edge_count
+
+    # expand every weight along the edges of its group
+    verts, groups, weights = read_vertex_weights(me)
+    reps = edge_count[groups]
+    entry = np.repeat(np.arange(len(groups)), reps)
+    offset = np.arange(len(entry)) - np.repeat(np.cumsum(reps) - reps, reps)
+    edge = edge_start[groups][entry] + offset
+
+    # sparse target matrix: sum weights per (target, vertex)
+    keys, inverse = np.unique(edge_col[edge] * n + verts[entry], return_inverse=True)
+    summed = np.bincount(inverse, weights=weights[entry] * edge_factor[edge],
+                         minlength=len(keys))
+    t_cols = keys // n
+    t_verts = keys % n
+
+    new = summed
+    if normalize and len(keys):
+        totals = np.bincount(t_verts, weights=summed, minlength=n)
+        untouched = np.array([i not in plan and (deform is None or vg.name in deform)
+                              for i, vg in enumerate(vgroups)], dtype=bool)
+        kept = untouched[groups]
+        rest = np.bincount(verts[kept], weights=weights[kept], minlength=n)
+        # targets fill what the untouched deform groups leave to 1
+        scale = np.ones(n)
+        fill = (totals > 0) & (rest < 1.0)
+        scale[fill] = (1.0 - rest[fill]) / totals[fill]
+        new = summed * scale[t_verts]
+    changed = np.abs(new - summed) > 1e-6
+    col_starts = np.searchsorted(t_cols, np.arange(len(targets) + 1))
+
+    # a whole, unchanged single source group is renamed instead of rewritten
+    reuse = {}
+    for name in targets:
+        col = target_col[name]
+        src = sources[name]
+        if (len(src) == 1 and src[0][1] == 1.0 and len(plan[src[0][0]]) == 1
+                and not changed[col_starts[col]:col_starts[col + 1]].any()):
+            reuse[name] = vgroups[src[0][0]]
+
+    reused = set(reuse.values())
+    removed = 0
+    for index in plan:
+        if vgroups[index] not in reused:
+            obj.vertex_groups.remove(vgroups[index])
+            removed += 1
+
+    # two step rename, so swapped names don't collide
+    for vg in reused:
+        vg.name = f"__rbm_tmp_{vg.index}"
+    written = 0
+    for name in targets:
+        vg = reuse.get(name)
+        if vg is not None:
+            vg.name = name
+            continue
+        vg = obj.vertex_groups.new(name=name)
+        col = target_col[name]
+        span = slice(col_starts[col], col_starts[col + 1])
+        write_group_weights(vg, t_verts[span], new[span])
+        written += 1
+    return written, len(reuse), removed - written
+
+
+def transfer_weights(meshes, rigify_arm, mapping, imported_parent, splits=None,
+                     prefix=".", merge_unmapped=True, normalize=True):
+    """Bind meshes to rigify_arm and merge their vertex groups per mapping.
+    Bones without a bone of their own on the Rigify side (unmappable, IK,
+    helpers, ...) count as unmapped. Returns (rewritten, renamed, removed)
+    group counts."""
+    imp2rig = created_bones(mapping)
+    # groups of bones of either rig count as deform groups when normalizing
+    deform = {b.name for b in rigify_arm.data.bones} | set(imported_parent)
+    done = set()
+    written = renamed = removed = 0
+    for obj in meshes:
+        # Find or create Armature modifier
+        arm_mod = next(
+            (m for m in obj.modifiers if m.type == 'ARMATURE'), None)
+        if not arm_mod:
+            arm_mod = obj.modifiers.new(name="Armature", type='ARMATURE')
+        arm_mod.object = rigify_arm
+
+        # Merge vertex groups, once per mesh data
+        if obj.data in done:
+            continue
+        done.add(obj.data)
+        plan = merge_plan(
+            [vg.name for vg in obj.vertex_groups], imp2rig, imported_parent,
+            prefix, merge_unmapped, splits)
+        counts = merge_vertex_groups(obj, plan, normalize, deform)
+        written += counts[0]
+        renamed += counts[1]
+        removed += counts[2]
+
+        log.info(f"Retargeted '{obj.name}' to '{rigify_arm.name}'")
+    return written, renamed, removed
 
 
 class RBM_OT_TransferMeshWeights(Operator):
-    """Rebind selected meshes from imported rig to Rigify rig and rename vertex groups"""
+    """Rebind selected meshes from imported rig to Rigify rig and merge/rename vertex groups"""
     bl_idname = "rbm.transfer_mesh_weights"
     bl_label = "Transfer Mesh Weights"
     bl_options = {'REGISTER', 'UNDO'}
@@ -381,18 +1703,42 @@ class RBM_OT_TransferMeshWeights(Operator):
         default=".",
         description="Prefix to apply to the renamed vertex groups"
     )
+    merge_unmapped: BoolProperty(
+        name="Merge Unmapped",
+        default=True,
+        description="Add weights of imported bones missing from the mapping to their nearest mapped parent"
+    )
+    normalize: BoolProperty(
+        name="Normalize",
+        default=True,
+        description="Normalize the weights of the mapped groups per vertex"
+    )
+    resample_chains: BoolProperty(
+        name="Resample Chains",
+        default=True,
+        description="Split weights of imported chains with dropped bones over the Rigify chain by arc length (needs scanned rigs)"
+    )
 
     def execute(self, context):
         # 1. Load mapping
-        blend_dir = os.path.dirname(bpy.data.filepath) or os.getcwd()
-        mapping_path = os.path.join(blend_dir, "bone_mapping.json")
+        blend_dir = sidecar_dir()
         try:
-            with open(mapping_path, "r") as f:
-                mapping = json.load(f)
+            mapping = load_mapping(blend_dir)
             imp2rig = {e["imported"]: e["rigify"] for e in mapping}
-        except Exception as e:
+        except (OSError, ValueError, KeyError, TypeError) as e:
             self.report({'ERROR'}, f"Failed to read bone_mapping.json: {e}")
             return {'CANCELLED'}
+        try:
+            imported_parent = {
+                b["name"]: b["parent"] for b in load_bone_lists(blend_dir)[1]}
+        except (OSError, ValueError):
+            imported_parent = {}
+
+        splits = {}
+        bundle = load_bundle()
+        if self.resample_chains and bundle and bundle.get("imported") and bundle.get("metarig"):
+            splits = chain_splits(
+                chain_resampling(mapping, bundle["imported"], bundle["metarig"]))
 
         # 2. Identify the Rigify armature
         armatures = [
@@ -409,26 +1755,360 @@ class RBM_OT_TransferMeshWeights(Operator):
             self.report({'ERROR'}, "No mesh objects selected.")
             return {'CANCELLED'}
 
-        # 4. Rebind modifiers & rename vertex groups
-        for obj in meshes:
-            # 4.1 Find or create Armature modifier
-            arm_mod = next(
-                (m for m in obj.modifiers if m.type == 'ARMATURE'), None)
-            if not arm_mod:
-                arm_mod = obj.modifiers.new(name="Armature", type='ARMATURE')
-            arm_mod.object = rigify_arm
+        # 4. Rebind modifiers & merge vertex groups
+        written, renamed, removed = transfer_weights(
+            meshes, rigify_arm, mapping, imported_parent, splits,
+            self.prefix, self.merge_unmapped, self.normalize)
+
+        self.report(
+            {'INFO'},
+            f"Mesh weights transferred: {len(meshes)} meshes, {renamed} groups renamed, "
+            f"{written} rewritten, {removed} removed.")
+        return {'FINISHED'}
+
+
+
+#  Batch retarget
+#
+# run_batch() retargets a directory of .blend/.fbx/.glb assets with a pool of
+# background Blender processes, one asset per process. Each worker runs
+# batch_worker(): import, scan, map (shared mapping cache first, then naming
+# rules and optionally geometry), validate, apply, transfer weights and save,
+# then writes a per-asset JSON report with timings and problems.
+#
+#   blender -b --python-expr "import importlib; importlib.import_module(
+#       '<addon>.submodules.to_rigify').run_batch('in_dir', 'out_dir', workers=4)"
+
+BATCH_INPUTS = {".blend": None, ".fbx": "fbx", ".glb": "gltf", ".gltf": "gltf"}
+BATCH_SUFFIX = "_rigify"
+BATCH_TIMEOUT = 1800
+
+
+def batch_inputs(input_dir):
+    """Assets to retarget in input_dir, without earlier batch output."""
+    return sorted(
+        os.path.join(input_dir, f) for f in os.listdir(input_dir)
+        if os.path.splitext(f)[1].lower() in BATCH_INPUTS
+        and not os.path.splitext(f)[0].endswith(BATCH_SUFFIX))
+
+
+def report_path(output_dir, asset):
+    return os.path.join(output_dir, os.path.splitext(os.path.basename(asset))[0] + ".report.json")
+
+
+def is_rigify_armature(obj, metarig_name="metarig"):
+    """Metarig (by name or rigify_type) or generated Rigify rig (rig_id)."""
+    return (obj.name == metarig_name
+            or obj.data.get("rig_id") is not None
+            or any(getattr(pb, "rigify_type", "") for pb in obj.pose.bones))
+
+
+def find_imported_rig(context, metarig_name="metarig"):
+    """Armature with the most bones, Rigify's own armatures left out, the
+    meshes deformed by it and the names of the armatures left out."""
+    arms = [o for o in context.scene.objects if o.type == 'ARMATURE']
+    skipped = [o.name for o in arms if is_rigify_armature(o, metarig_name)]
+    arms = [o for o in arms if o.name not in skipped]
+    if not arms:
+        return None, [], skipped
+    arm = max(arms, key=lambda o: len(o.data.bones))
+    meshes = [o for o in context.scene.objects if o.type == 'MESH' and (
+        o.parent is arm
+        or any(m.type == 'ARMATURE' and m.object is arm for m in o.modifiers))]
+    return arm, meshes, skipped
+
+
+def add_metarig(context, job, imported_obj):
+    """Metarig from job["metarig_blend"] or Rigify's human metarig, placed
+    with the imported rig's transform so armature space coordinates match."""
+    if job.get("metarig_blend"):
+        with bpy.data.libraries.load(job["metarig_blend"], link=False) as (src, dst):
+            dst.objects = [job.get("metarig_object") or "metarig"]
+        metarig_obj = dst.objects[0]
+        if metarig_obj is None:
+            raise RuntimeError(f"No object '{job.get('metarig_object')}' in {job['metarig_blend']}")
+        context.scene.collection.objects.link(metarig_obj)
+    else:
+        import addon_utils
+        addon_utils.enable("rigify", default_set=False)
+        bpy.ops.object.armature_human_metarig_add()
+        metarig_obj = context.object
+    metarig_obj.matrix_world = imported_obj.matrix_world
+    return metarig_obj
+
+
+def batch_worker(job):
+    """Retarget the asset of one batch job inside a background Blender and
+    write its report. job: input, output_dir and batch options."""
+    context = bpy.context
+    report = {"input": job["input"], "status": "error", "timings": {}, "problems": []}
+    timings = report["timings"]
+    start = last = time.perf_counter()
+
+    def lap(stage):
+        nonlocal last
+        now = time.perf_counter()
+        timings[stage] = round(now - last, 4)
+        last = now
+
+    try:
+        importer = BATCH_INPUTS[os.path.splitext(job["input"])[1].lower()]
+        if importer:
+            bpy.ops.wm.read_homefile(use_empty=True)
+            getattr(bpy.ops.import_scene, importer)(filepath=job["input"])
+        # a stale bundle of an earlier run doesn't describe this asset
+        if BUNDLE_TEXT in bpy.data.texts:
+            bpy.data.texts.remove(bpy.data.texts[BUNDLE_TEXT])
+        imported_obj, meshes, skipped = find_imported_rig(
+            context, job.get("metarig_object") or "metarig")
+        report["rigify_armatures_skipped"] = skipped
+        if imported_obj is None:
+            raise RuntimeError("No armature found besides Rigify ones")
+        report["imported_rig"] = imported_obj.name
+        log.info(f"Batch retarget of {job['input']}: imported rig '{imported_obj.name}'")
+        if context.object is not None and context.object.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+        lap("load")
+
+        metarig_obj = add_metarig(context, job, imported_obj)
+        scan_armature(imported_obj, "imported")
+        scan_armature(metarig_obj, "metarig")
+        bundle = load_bundle()
+        imported, metarig = bundle["imported"], bundle["metarig"]
+        imp_list = bone_list(imported)
+        report.update(bones=len(imp_list), meshes=len(meshes))
+        lap("scan")
+
+        mapping = load_cached_mapping(imp_list)
+        report["mapping_source"] = "cache"
+        if mapping is None:
+            mapping = rule_based_mapping(imp_list, set(metarig["names"]))
+            report["mapping_source"] = "rules"
+            if job.get("use_geometry", True):
+                mapping = geometric_mapping(imported, metarig, mapping)
+                report["mapping_source"] = "rules+geometry"
+        write_mapping(None, mapping)
+        lap("map")
+
+        mapping, problems = validate_mapping(
+            mapping, set(imported["names"]), set(metarig["names"]))
+        problems += rig_problems(mapping, metarig_obj)
+        report["problems"] = problems
+        lap("validate")
+        if problems:
+            raise RuntimeError(f"{len(problems)} problems in the mapping")
+
+        mapped, created, chains = apply_mapping(
+            context, metarig_obj, mapping, imported, metarig=metarig,
+            resample=job.get("resample", True))
+        report.update(mapped=mapped, extra_bones=created, chains_resampled=chains)
+        store_cached_mapping(imp_list, mapping)
+        lap("apply")
+
+        target, prefix = metarig_obj, ""
+        if job.get("generate", True):
+            bpy.ops.pose.rigify_generate()
+            target, prefix = metarig_obj.data.rigify_target_rig, job.get("prefix", "DEF-")
+            lap("generate")
+
+        splits = chain_splits(chain_resampling(mapping, imported, metarig)) \
+            if job.get("resample", True) else None
+        imported_parent = {b["name"]: b["parent"] for b in imp_list}
+        written, renamed, removed = transfer_weights(
+            meshes, target, mapping, imported_parent, splits, prefix)
+        report.update(groups_rewritten=written, groups_renamed=renamed, groups_removed=removed)
+        lap("weights")
+
+        stem = os.path.splitext(os.path.basename(job["input"]))[0]
+        report["output"] = os.path.join(job["output_dir"], stem + BATCH_SUFFIX + ".blend")
+        bpy.ops.wm.save_as_mainfile(filepath=report["output"])
+        lap("save")
+        report["status"] = "ok"
+    except Exception as e:
+        log.error(f"Batch retarget of {job['input']} failed", exc_info=True)
+        report["error"] = f"{type(e).__name__}: {e}"
+    timings["total"] = round(time.perf_counter() - start, 4)
+
+    with open(report_path(job["output_dir"], job["input"]), "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+class BatchRun(threading.Thread):
+    """Runs batch jobs in a pool of background Blender processes. Progress is
+    read from done/reports; cancel() stops queued jobs and kills running ones."""
+
+    def __init__(self, input_dir, output_dir, workers=2, **options):
+        super().__init__(daemon=True)
+        self.inputs = batch_inputs(input_dir)
+        self.output_dir = output_dir
+        self.workers = max(1, workers)
+        self.options = options
+        self.reports = []
+        self.cancelled = threading.Event()
+        self._procs = set()
+        self._lock = threading.Lock()
+
+    def run_job(self, asset):
+        if self.cancelled.is_set():
+            return None
+        job = dict(self.options, input=asset, output_dir=self.output_dir)
+        expr = ("import importlib, json, sys; "
+                f"importlib.import_module({__name__!r}).batch_worker("
+                "json.loads(sys.argv[sys.argv.index('--') + 1]))")
+        cmd = [bpy.app.binary_path, "-b"]
+        if asset.lower().endswith(".blend"):
+            cmd.append(asset)
+        cmd += ["--python-expr", expr, "--", json.dumps(job)]
+
+        path = report_path(self.output_dir, asset)
+        if os.path.exists(path):
+            os.remove(path)
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        with self._lock:
+            self._procs.add(proc)
+        try:
+            output, _ = proc.communicate(timeout=BATCH_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            output, _ = proc.communicate()
+        with self._lock:
+            self._procs.discard(proc)
+
+        try:
+            with open(path) as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            report = {"input": asset, "status": "error",
+                      "error": f"Worker exited with {proc.returncode}",
+                      "log": output[-2000:]}
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+        with self._lock:
+            self.reports.append(report)
+        log.info(f"Batch {report['status']}: {asset}")
+        return report
+
+    def run(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as pool:
+            list(pool.map(self.run_job, self.inputs))
+        summary = {
+            "assets": len(self.inputs),
+            "ok": sum(1 for r in self.reports if r["status"] == "ok"),
+            "failed": [r["input"] for r in self.reports if r["status"] != "ok"],
+            "cancelled": self.cancelled.is_set(),
+            "seconds": round(time.perf_counter() - start, 2),
+            "reports": sorted(self.reports, key=lambda r: r["input"]),
+        }
+        with open(os.path.join(self.output_dir, "batch_report.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+
+    def cancel(self):
+        self.cancelled.set()
+        with self._lock:
+            for proc in self._procs:
+                proc.kill()
+
+
+def run_batch(input_dir, output_dir, workers=2, **options):
+    """Blocking batch retarget, for command line use. Returns the reports."""
+    run = BatchRun(input_dir, output_dir, workers, **options)
+    run.run()
+    return run.reports
+
+
+class RBM_OT_BatchRetarget(Operator):
+    """Retarget every .blend/.fbx/.glb in a directory to Rigify in background Blender processes"""
+    bl_idname = "rbm.batch_retarget"
+    bl_label = "Batch Retarget"
+
+    input_dir: StringProperty(name="Input", subtype='DIR_PATH')
+    output_dir: StringProperty(name="Output", subtype='DIR_PATH')
+    workers: IntProperty(
+        name="Workers",
+        default=max(1, (os.cpu_count() or 2) // 2),
+        min=1,
+        description="Blender processes running at the same time"
+    )
+    metarig_blend: StringProperty(
+        name="Metarig File",
+        subtype='FILE_PATH',
+        description="Append the metarig from this .blend instead of adding Rigify's human metarig"
+    )
+    metarig_object: StringProperty(name="Metarig Object", default="metarig")
+    use_geometry: BoolProperty(
+        name="Use Geometry",
+        default=True,
+        description="Match bones the naming rules miss by rest pose geometry"
+    )
+    generate: BoolProperty(
+        name="Generate Rig",
+        default=True,
+        description="Generate the Rigify rig and bind the meshes to it, else bind them to the metarig"
+    )
+    prefix: StringProperty(name="DEF Prefix", default="DEF-")
+
+    _timer = None
+    _run = None
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        input_dir = bpy.path.abspath(self.input_dir)
+        output_dir = bpy.path.abspath(self.output_dir) or input_dir
+        if not os.path.isdir(input_dir):
+            self.report({'ERROR'}, f"Not a directory: {input_dir}")
+            return {'CANCELLED'}
+        self._run = BatchRun(
+            input_dir, output_dir, self.workers,
+            metarig_blend=bpy.path.abspath(self.metarig_blend),
+            metarig_object=self.metarig_object, use_geometry=self.use_geometry,
+            generate=self.generate, prefix=self.prefix)
+        if not self._run.inputs:
+            self.report({'WARNING'}, "No .blend/.fbx/.glb files in the input directory")
+            return {'CANCELLED'}
+        self._run.start()
+
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.5, window=context.window)
+        wm.progress_begin(0, len(self._run.inputs))
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self._run.cancel()
+            self.finish(context)
+            self.report({'WARNING'}, "Batch retarget cancelled")
+            return {'CANCELLED'}
 
-            # 4.2 Rename vertex groups
-            for vgroup in obj.vertex_groups:
-                old_name = vgroup.name
-                if old_name in imp2rig:
-                    vgroup.name = self.prefix + imp2rig[old_name]
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
 
-            log.info(f"Retargeted '{obj.name}' to '{rigify_arm.name}'")
+        done = len(self._run.reports)
+        total = len(self._run.inputs)
+        context.window_manager.progress_update(done)
+        context.workspace.status_text_set(
+            f"Batch retarget: {done}/{total} assets  (Esc to cancel)")
+        if self._run.is_alive():
+            return {'PASS_THROUGH'}
 
-        self.report({'INFO'}, "Mesh weights transferred successfully.")
+        self.finish(context)
+        failed = sum(1 for r in self._run.reports if r["status"] != "ok")
+        self.report(
+            {'WARNING' if failed else 'INFO'},
+            f"Batch retarget: {total - failed}/{total} ok → "
+            f"{os.path.join(self._run.output_dir, 'batch_report.json')}")
         return {'FINISHED'}
 
+    def finish(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
 
 
 #  UI
@@ -444,18 +2124,25 @@ class RBM_PT_Panel(Panel):
         col = self.layout.column(align=True)
         col.operator("rbm.export_metarig")
         col.operator("rbm.scan_imported")
+        col.operator("rbm.rule_map")
+        col.operator("rbm.geometry_map")
         col.operator("rbm.call_llm")
         col.operator("rbm.apply_mapping")
         col.operator("rbm.transfer_mesh_weights")
+        col.separator()
+        col.operator("rbm.batch_retarget")
 
 #  Registration
 
 classes = (
     RBM_OT_ExportMetarigBones,
     RBM_OT_ScanImportedBones,
+    RBM_OT_RuleMap,
+    RBM_OT_GeometryMap,
     RBM_OT_CallLLMMap,
     RBM_OT_ApplyMapping,
     RBM_OT_TransferMeshWeights,
+    RBM_OT_BatchRetarget,
     RBM_PT_Panel,
 )
 
@@ -466,5 +2153,9 @@ def register():
 
 
 def unregister():
+    mock = sys.modules.get(f"{__package__}._llm_mock")
+    if mock:
+        mock.stop_mock_server()
+    _json_cache.clear()
     for c in reversed(classes):
         bpy.utils.unregister_class(c)
@@ -1,5 +1,10 @@
-import bmesh
 import bpy
+import numpy as np
+from bpy.app.handlers import persistent
+from bpy.props import (BoolProperty, EnumProperty, FloatProperty, IntProperty,
+                       PointerProperty, StringProperty)
+
+from .. import log
 
 bl_info = {
     "name": "Weight Paint Mask Tools",
@@ -15,9 +20,12 @@ bl_info = {
     ),
     "description": (
         "Adds tools for masking in Weight Paint mode:\n"
-        "• Mask From Bones – hide mesh not affected by selected bones\n"
-        "• Mask Grow – expand the current mask selection\n"
-        "• Mask Shrink – contract the current mask selection"
+        "• Mask From Bones – hide mesh not affected by selected bones,\n"
+        "  optionally live, following the pose bone selection\n"
+        "• Mask Geodesic From Bones – reveal within a surface distance of the bones' weights\n"
+        "• Mask Grow – expand the current mask by N edge rings\n"
+        "• Mask Shrink – contract the current mask by N edge rings\n"
+        "• Mask Stack – push/pop/swap named masks and combine them"
     ),
     "warning": "",
     "doc_url": "",
@@ -43,60 +51,224 @@ class OBJECT_OT_weight_mask_mesh_from_bone(bpy.types.Operator):
     def execute(self, context):
         mesh_obj = context.object
 
-        # find Armature object from modifiers
-        arm_obj = None
-        for mod in mesh_obj.modifiers:
-            if mod.type == 'ARMATURE' and mod.object:
-                arm_obj = mod.object
-                break
-
-        if not arm_obj or arm_obj.type != 'ARMATURE':
+        arm_obj = get_armature(mesh_obj)
+        if not arm_obj:
             self.report({'WARNING'}, "No valid Armature modifier found")
             return {'CANCELLED'}
 
-        # gather names of selected pose bones
-        sel_bones = [pb.name for pb in arm_obj.pose.bones if pb.bone.select]
-        if not sel_bones:
+        if not any(b.select for b in arm_obj.data.bones):
             self.report({'WARNING'}, "No pose bones selected on Armature")
             return {'CANCELLED'}
 
-        # switch to Edit Mode on the mesh
-        bpy.ops.object.mode_set(mode='EDIT')
-        bm = bmesh.from_edit_mesh(mesh_obj.data)
-
-        # unhide all, then deselect everything
-        bpy.ops.mesh.reveal()
-        bpy.ops.mesh.select_all(action='DESELECT')
-        bm.verts.ensure_lookup_table()
-
         # match those bone names to vertex groups
-        vg_indices = [
-            mesh_obj.vertex_groups[name].index
-            for name in sel_bones
-            if name in mesh_obj.vertex_groups
-        ]
+        vg_indices = selected_bone_groups(mesh_obj, arm_obj)
         if not vg_indices:
             self.report(
                 {'WARNING'}, "No vertex groups match selected bone names")
             # still proceed, so you get an empty selection
 
-        # select verts whose weight in any of those groups is > 0
-        for v in bm.verts:
-            has_weight = False
-            for g in mesh_obj.data.vertices[v.index].groups:
-                if g.group in vg_indices and g.weight > 0.0:
-                    has_weight = True
-                    break
-            v.select = has_weight
-
-        bmesh.update_edit_mesh(mesh_obj.data)
+        # re-index the current weights, live mask updates reuse this index
+        index = get_bone_index(mesh_obj.data, rebuild=True)
 
-        bpy.ops.mesh.hide(unselected=True)
+        # hide verts without weight > 0 in any of those groups
+        set_hidden(mesh_obj.data, ~index.mask(vg_indices))
+        return {'FINISHED'}
 
-        # return to Weight Paint
-        bpy.ops.object.mode_set(mode='WEIGHT_PAINT')
 
-        return {'FINISHED'}
+# Mesh topology is cached per mesh datablock, so repeated grow/shrink steps
+# don't have to rebuild the adjacency each time.
+_topology_cache = {}
+
+
+class MaskTopology:
+    """Vertex adjacency (CSR) plus the index arrays needed to write hide flags."""
+
+    def __init__(self, me):
+        nv = len(me.vertices)
+        self.key = topology_key(me)
+
+        self.edges = np.empty(len(me.edges) * 2, dtype=np.int32)
+        me.edges.foreach_get('vertices', self.edges)
+        self.edges.shape = (-1, 2)
+
+        self.loop_verts = np.empty(len(me.loops), dtype=np.int32)
+        me.loops.foreach_get('vertex_index', self.loop_verts)
+        self.poly_starts = np.empty(len(me.polygons), dtype=np.int32)
+        me.polygons.foreach_get('loop_start', self.poly_starts)
+
+        # CSR: neighbours of vertex v are indices[indptr[v]:indptr[v + 1]]
+        src = np.concatenate((self.edges[:, 0], self.edges[:, 1]))
+        dst = np.concatenate((self.edges[:, 1], self.edges[:, 0]))
+        order = np.argsort(src, kind='stable')
+        self.indices = dst[order]
+        self.indptr = np.zeros(nv + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=nv), out=self.indptr[1:])
+        # edge index of every CSR slot, to look up per-edge values
+        self.slot_edges = (order % max(len(self.edges), 1)).astype(np.int32)
+
+        # edge lengths in CSR order, filled on demand by edge_lengths()
+        self.slot_lengths = None
+        self.lengths_matrix = None
+
+    def neighbor_slots(self, verts):
+        """CSR slots of all neighbours of verts, plus the neighbour count per vert."""
+        starts = self.indptr[verts]
+        counts = self.indptr[verts + 1] - starts
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        return offsets + np.arange(offsets.size), counts
+
+    def neighbors(self, verts):
+        """All neighbours of verts (with duplicates) in one gather."""
+        return self.indices[self.neighbor_slots(verts)[0]]
+
+    def expand(self, mask, steps):
+        """Return mask grown by steps edge rings (multi-source BFS)."""
+        result = mask.copy()
+        frontier = np.flatnonzero(mask)
+        for _ in range(steps):
+            if not frontier.size:
+                break
+            nbrs = self.neighbors(frontier)
+            nbrs = np.unique(nbrs[~result[nbrs]])
+            result[nbrs] = True
+            frontier = nbrs
+        return result
+
+    def edge_lengths(self, me, matrix):
+        """World space edge lengths in CSR order, cached with the topology."""
+        key = tuple(tuple(row) for row in matrix.to_3x3())
+        if self.slot_lengths is None or self.lengths_matrix != key:
+            co = np.empty(len(me.vertices) * 3, dtype=np.float32)
+            me.vertices.foreach_get('co', co)
+            co = co.reshape(-1, 3) @ np.array(key, dtype=np.float32).T
+            lengths = np.linalg.norm(
+                co[self.edges[:, 0]] - co[self.edges[:, 1]], axis=1)
+            self.slot_lengths = lengths[self.slot_edges]
+            self.lengths_matrix = key
+        return self.slot_lengths
+
+    def geodesic_distance(self, seed, lengths, max_distance):
+        """Shortest edge-path distance from the seed verts, up to max_distance.
+
+        Label-correcting Dijkstra: every pass relaxes all edges leaving the
+        verts whose distance improved in the previous pass, so the work stays
+        proportional to the region inside the radius. Verts further away than
+        max_distance are left at inf.
+        """
+        dist = np.full(len(seed), np.inf, dtype=np.float32)
+        dist[seed] = 0.0
+        frontier = np.flatnonzero(seed)
+        while frontier.size:
+            slots, counts = self.neighbor_slots(frontier)
+            nbrs = self.indices[slots]
+            cand = np.repeat(dist[frontier], counts) + lengths[slots]
+            keep = (cand < dist[nbrs]) & (cand <= max_distance)
+            if not keep.any():
+                break
+            nbrs = nbrs[keep]
+            np.minimum.at(dist, nbrs, cand[keep])
+            frontier = np.unique(nbrs)
+        return dist
+
+
+def topology_key(me):
+    return (len(me.vertices), len(me.edges), len(me.loops), len(me.polygons))
+
+
+def get_topology(me):
+    topo = _topology_cache.get(me.as_pointer())
+    if topo is None or topo.key != topology_key(me):
+        log.debug(f"Building mask topology for '{me.name}'")
+        topo = MaskTopology(me)
+        _topology_cache[me.as_pointer()] = topo
+    return topo
+
+
+def get_hidden(me):
+    hidden = np.empty(len(me.vertices), dtype=bool)
+    me.vertices.foreach_get('hide', hidden)
+    return hidden
+
+
+def set_hidden(me, hidden, topo=None):
+    """Write vertex hide flags in bulk.
+
+    Edges and faces touching a hidden vertex are hidden as well, the same way
+    mesh.hide() does it, so the mask displays correctly in Weight Paint mode.
+    """
+    topo = topo or get_topology(me)
+    hidden = np.ascontiguousarray(hidden, dtype=bool)
+    me.vertices.foreach_set('hide', hidden)
+    if len(topo.edges):
+        me.edges.foreach_set('hide', hidden[topo.edges].any(axis=1))
+    if len(topo.poly_starts):
+        me.polygons.foreach_set(
+            'hide', np.logical_or.reduceat(hidden[topo.loop_verts], topo.poly_starts))
+    me.update()
+
+
+def get_armature(mesh_obj):
+    for mod in mesh_obj.modifiers:
+        if mod.type == 'ARMATURE' and mod.object and mod.object.type == 'ARMATURE':
+            return mod.object
+    return None
+
+
+def selected_bone_groups(mesh_obj, arm_obj):
+    """Vertex group indices matching the selected pose bones."""
+    return [
+        mesh_obj.vertex_groups[pb.name].index
+        for pb in arm_obj.pose.bones
+        if pb.bone.select and pb.name in mesh_obj.vertex_groups
+    ]
+
+
+# Per mesh index of which verts each vertex group weights, built from a
+# single pass over the vertex weights.
+_bone_index_cache = {}
+
+
+class BoneVertexIndex:
+    """Packed bitset per vertex group of the verts with weight > 0."""
+
+    def __init__(self, me):
+        self.key = topology_key(me)
+        self.count = len(me.vertices)
+
+        groups = []
+        verts = []
+        for v in me.vertices:
+            for g in v.groups:
+                if g.weight > 0.0:
+                    groups.append(g.group)
+                    verts.append(v.index)
+        groups = np.array(groups, dtype=np.int32)
+        verts = np.array(verts, dtype=np.int32)
+
+        order = np.argsort(groups, kind='stable')
+        group_ids, starts = np.unique(groups[order], return_index=True)
+        self.bits = {}
+        for group, members in zip(group_ids, np.split(verts[order], starts[1:])):
+            row = np.zeros(self.count, dtype=bool)
+            row[members] = True
+            self.bits[int(group)] = np.packbits(row)
+
+    def mask(self, vg_indices):
+        """Bool array of verts weighted by any of the given groups."""
+        rows = [self.bits[g] for g in vg_indices if g in self.bits]
+        if not rows:
+            return np.zeros(self.count, dtype=bool)
+        merged = np.bitwise_or.reduce(rows, axis=0)
+        return np.unpackbits(merged, count=self.count).astype(bool)
+
+
+def get_bone_index(me, rebuild=False):
+    index = _bone_index_cache.get(me.as_pointer())
+    if rebuild or index is None or index.key != topology_key(me):
+        log.debug(f"Indexing vertex group weights of '{me.name}'")
+        index = BoneVertexIndex(me)
+        _bone_index_cache[me.as_pointer()] = index
+    return index
 
 
 class WEIGHTPAINT_OT_mask_grow(bpy.types.Operator):
@@ -105,29 +277,26 @@ class WEIGHTPAINT_OT_mask_grow(bpy.types.Operator):
     bl_label = "Mask Grow"
     bl_options = {'REGISTER', 'UNDO'}
 
+    steps: IntProperty(
+        name="Steps",
+        description="Number of edge rings to reveal",
+        default=1,
+        min=1,
+        soft_max=50
+    )
+
     @classmethod
     def poll(cls, context):
         obj = context.object
-        print("poll")
         return context.mode == 'PAINT_WEIGHT' and obj and obj.type == 'MESH'
 
     def execute(self, context):
-        bpy.ops.object.mode_set(mode='EDIT')
-
-        # select all visible vertices
-        bpy.ops.mesh.select_all(action='SELECT')
-
-        # reveal hidden verts without selecting them
-        bpy.ops.mesh.reveal(select=False)
-
-        # grow selection by one ring
-        bpy.ops.mesh.select_more()
+        me = context.object.data
+        topo = get_topology(me)
 
-        # hide everything except the newly-grown selection
-        bpy.ops.mesh.select_all(action='INVERT')
-        bpy.ops.mesh.hide()
-
-        bpy.ops.object.mode_set(mode='WEIGHT_PAINT')
+        # reveal all verts within 'steps' rings of the visible ones
+        visible = topo.expand(~get_hidden(me), self.steps)
+        set_hidden(me, ~visible, topo)
         return {'FINISHED'}
 
 
@@ -137,35 +306,387 @@ class WEIGHTPAINT_OT_mask_shrink(bpy.types.Operator):
     bl_label = "Mask Shrink"
     bl_options = {'REGISTER', 'UNDO'}
 
+    steps: IntProperty(
+        name="Steps",
+        description="Number of edge rings to hide",
+        default=1,
+        min=1,
+        soft_max=50
+    )
+
+    @classmethod
+    def poll(cls, context):
+        obj = context.object
+        return context.mode == 'PAINT_WEIGHT' and obj and obj.type == 'MESH'
+
+    def execute(self, context):
+        me = context.object.data
+        topo = get_topology(me)
+
+        # shrinking the visible area is growing the hidden one
+        hidden = get_hidden(me)
+        if not hidden.any():
+            return {'CANCELLED'}
+        set_hidden(me, topo.expand(hidden, self.steps), topo)
+        return {'FINISHED'}
+
+
+class WEIGHTPAINT_OT_mask_geodesic(bpy.types.Operator):
+    """Hide mesh further away than a surface distance from the selected bones' weights"""
+    bl_idname = "object.weight_paint_mask_geodesic"
+    bl_label = "Mask Geodesic From Bones"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    distance: FloatProperty(
+        name="Distance",
+        description="Reveal verts within this distance along the surface from the weighted region",
+        default=0.05,
+        min=0.0,
+        soft_max=1.0,
+        subtype='DISTANCE'
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return OBJECT_OT_weight_mask_mesh_from_bone.poll(context)
+
+    def execute(self, context):
+        mesh_obj = context.object
+        me = mesh_obj.data
+
+        arm_obj = get_armature(mesh_obj)
+        if not arm_obj:
+            self.report({'WARNING'}, "No valid Armature modifier found")
+            return {'CANCELLED'}
+
+        vg_indices = selected_bone_groups(mesh_obj, arm_obj)
+        if not vg_indices:
+            self.report(
+                {'WARNING'}, "No vertex groups match selected bone names")
+            return {'CANCELLED'}
+
+        seed = get_bone_index(me, rebuild=True).mask(vg_indices)
+        if not seed.any():
+            self.report({'WARNING'}, "Selected bones have no weights")
+            return {'CANCELLED'}
+
+        topo = get_topology(me)
+        lengths = topo.edge_lengths(me, mesh_obj.matrix_world)
+        dist = topo.geodesic_distance(seed, lengths, self.distance)
+
+        set_hidden(me, ~np.isfinite(dist), topo)
+        return {'FINISHED'}
+
+
+# Named mask states per mesh datablock, kept for the session. Visible verts
+# are stored as packed bits (1 bit per vertex).
+_mask_stacks = {}
+
+
+class MaskStack:
+    def __init__(self, key):
+        self.key = key
+        self.entries = []  # [(name, packed visible bits)], top is last
+        self.current = ""  # name of the state currently applied, if any
+
+    @staticmethod
+    def pack(visible):
+        return np.packbits(visible)
+
+    @staticmethod
+    def unpack(bits, count):
+        return np.unpackbits(bits, count=count).astype(bool)
+
+
+def get_mask_stack(me, create=False):
+    key = topology_key(me)
+    stack = _mask_stacks.get(me.as_pointer())
+    if stack is not None and stack.key != key:
+        # stored bits don't match the vertex layout anymore
+        log.info(f"Mesh '{me.name}' changed, dropping stored mask states")
+        stack = None
+        del _mask_stacks[me.as_pointer()]
+    if stack is None and create:
+        stack = _mask_stacks[me.as_pointer()] = MaskStack(key)
+    return stack
+
+
+def stack_poll(context):
+    obj = context.object
+    if not (obj and obj.type == 'MESH' and context.mode == 'PAINT_WEIGHT'):
+        return False
+    stack = get_mask_stack(obj.data)
+    return stack is not None and bool(stack.entries)
+
+
+class WEIGHTPAINT_OT_mask_push(bpy.types.Operator):
+    """Store the current mask on the mask stack"""
+    bl_idname = "object.weight_paint_mask_push"
+    bl_label = "Push Mask"
+    bl_options = {'REGISTER'}
+
+    name: StringProperty(
+        name="Name",
+        description="Name of the stored mask",
+        default="Mask"
+    )
+
     @classmethod
     def poll(cls, context):
         obj = context.object
         return context.mode == 'PAINT_WEIGHT' and obj and obj.type == 'MESH'
 
     def execute(self, context):
-        bpy.ops.object.mode_set(mode='EDIT')
+        me = context.object.data
+        stack = get_mask_stack(me, create=True)
+        stack.entries.append((self.name, MaskStack.pack(~get_hidden(me))))
+        stack.current = self.name
+        self.report({'INFO'}, f"Pushed mask '{self.name}' ({len(stack.entries)} stored)")
+        return {'FINISHED'}
 
-        # select all visible vertices
-        bpy.ops.mesh.select_all(action='SELECT')
 
-        # shrink selection by one ring
-        bpy.ops.mesh.select_less()
+class WEIGHTPAINT_OT_mask_pop(bpy.types.Operator):
+    """Restore the top mask of the mask stack and remove it from the stack"""
+    bl_idname = "object.weight_paint_mask_pop"
+    bl_label = "Pop Mask"
+    bl_options = {'REGISTER', 'UNDO'}
 
-        # hide the ring that was cut off
-        bpy.ops.mesh.select_all(action='INVERT')
-        bpy.ops.mesh.hide()
+    @classmethod
+    def poll(cls, context):
+        return stack_poll(context)
 
-        bpy.ops.object.mode_set(mode='WEIGHT_PAINT')
+    def execute(self, context):
+        me = context.object.data
+        stack = get_mask_stack(me)
+        name, bits = stack.entries.pop()
+        set_hidden(me, ~MaskStack.unpack(bits, len(me.vertices)))
+        stack.current = name
+        self.report({'INFO'}, f"Restored mask '{name}'")
         return {'FINISHED'}
 
 
+class WEIGHTPAINT_OT_mask_swap(bpy.types.Operator):
+    """Exchange the current mask with the top mask of the mask stack"""
+    bl_idname = "object.weight_paint_mask_swap"
+    bl_label = "Swap Mask"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        return stack_poll(context)
+
+    def execute(self, context):
+        me = context.object.data
+        stack = get_mask_stack(me)
+        name, bits = stack.entries[-1]
+        stack.entries[-1] = (stack.current or "Mask", MaskStack.pack(~get_hidden(me)))
+        set_hidden(me, ~MaskStack.unpack(bits, len(me.vertices)))
+        stack.current = name
+        self.report({'INFO'}, f"Swapped to mask '{name}'")
+        return {'FINISHED'}
+
+
+# Blender needs the enum items to stay referenced while they are displayed
+_entry_items = []
+
+
+def mask_entry_items(self, context):
+    _entry_items.clear()
+    obj = context.object if context else None
+    stack = get_mask_stack(obj.data) if obj and obj.type == 'MESH' else None
+    if stack:
+        for i, (name, _) in reversed(list(enumerate(stack.entries))):
+            _entry_items.append((str(i), name, f"Stack position {i + 1}"))
+    return _entry_items
+
+
+class WEIGHTPAINT_OT_mask_combine(bpy.types.Operator):
+    """Combine the current mask with a stored mask"""
+    bl_idname = "object.weight_paint_mask_combine"
+    bl_label = "Combine Mask"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    entry: EnumProperty(
+        name="Mask",
+        description="Stored mask to combine with",
+        items=mask_entry_items
+    )
+    operation: EnumProperty(
+        name="Operation",
+        items=[
+            ('UNION', "Union", "Reveal verts visible in either mask"),
+            ('INTERSECT', "Intersect", "Reveal only verts visible in both masks"),
+            ('DIFFERENCE', "Difference", "Hide verts visible in the stored mask"),
+        ],
+        default='UNION'
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return stack_poll(context)
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        me = context.object.data
+        stack = get_mask_stack(me)
+        name, bits = stack.entries[int(self.entry)]
+
+        visible = ~get_hidden(me)
+        stored = MaskStack.unpack(bits, len(visible))
+        if self.operation == 'UNION':
+            visible |= stored
+        elif self.operation == 'INTERSECT':
+            visible &= stored
+        else:  # DIFFERENCE
+            visible &= ~stored
+
+        set_hidden(me, ~visible)
+        stack.current = ""
+        return {'FINISHED'}
+
+
+class VIEW3D_MT_weight_mask_stack(bpy.types.Menu):
+    bl_label = "Mask Stack"
+    bl_idname = "VIEW3D_MT_weight_mask_stack"
+
+    def draw(self, context):
+        layout = self.layout
+        layout.operator(WEIGHTPAINT_OT_mask_push.bl_idname)
+        layout.operator(WEIGHTPAINT_OT_mask_pop.bl_idname)
+        layout.operator(WEIGHTPAINT_OT_mask_swap.bl_idname)
+        layout.operator(WEIGHTPAINT_OT_mask_combine.bl_idname, text="Combine Mask...")
+
+        stack = get_mask_stack(context.object.data) if context.object else None
+        if stack and stack.entries:
+            layout.separator()
+            for name, _ in reversed(stack.entries):
+                layout.label(text=name, icon='MOD_MASK')
+
+
+# Live mask: follow the pose bone selection. Selection changes are picked up
+# by a depsgraph handler and applied by a one-shot timer, so a burst of
+# clicks results in a single mask update.
+_live_state = {"key": None, "pending": False}
+
+
+def live_mask_target():
+    obj = bpy.context.view_layer.objects.active
+    if not (obj and obj.type == 'MESH' and obj.mode == 'WEIGHT_PAINT'):
+        return None, None
+    return obj, get_armature(obj)
+
+
+def selection_key(mesh_obj, arm_obj):
+    return (mesh_obj.name, tuple(b.name for b in arm_obj.data.bones if b.select))
+
+
+@persistent
+def live_mask_update(scene, depsgraph):
+    if _live_state["pending"]:
+        return
+    mesh_obj, arm_obj = live_mask_target()
+    if not arm_obj or selection_key(mesh_obj, arm_obj) == _live_state["key"]:
+        return
+    _live_state["pending"] = True
+    bpy.app.timers.register(
+        apply_live_mask, first_interval=scene.wp_mask_props.live_delay)
+
+
+def apply_live_mask():
+    _live_state["pending"] = False
+    if not bpy.context.scene.wp_mask_props.live_bones:
+        return None
+    mesh_obj, arm_obj = live_mask_target()
+    if not arm_obj:
+        return None
+
+    key = selection_key(mesh_obj, arm_obj)
+    if key == _live_state["key"]:
+        return None
+    _live_state["key"] = key
+
+    # keep the current mask while nothing is selected
+    vg_indices = selected_bone_groups(mesh_obj, arm_obj)
+    if vg_indices:
+        me = mesh_obj.data
+        set_hidden(me, ~get_bone_index(me).mask(vg_indices))
+    return None
+
+
+def set_live_mask(enabled):
+    handlers = bpy.app.handlers.depsgraph_update_post
+    _live_state["key"] = None
+    if enabled:
+        mesh_obj, _ = live_mask_target()
+        if mesh_obj:
+            # index the weights as they are now
+            get_bone_index(mesh_obj.data, rebuild=True)
+        if live_mask_update not in handlers:
+            handlers.append(live_mask_update)
+    elif live_mask_update in handlers:
+        handlers.remove(live_mask_update)
+
+
+def live_bones_changed(self, context):
+    set_live_mask(self.live_bones)
+
+
+@persistent
+def live_mask_load_post(_dummy):
+    """Drop the caches and mask stacks of the previous file, all keyed by
+    mesh pointers that the loaded file may reuse, and follow its live setting."""
+    _topology_cache.clear()
+    _bone_index_cache.clear()
+    _mask_stacks.clear()
+    # pending timers don't survive loading a file
+    _live_state["pending"] = False
+    scene = bpy.context.scene
+    set_live_mask(bool(scene and scene.wp_mask_props.live_bones))
+
+
+class PG_WPMaskProperties(bpy.types.PropertyGroup):
+    """WPMask's properties."""
+    live_bones: BoolProperty(
+        name="Live Mask From Bones",
+        description=(
+            "Update the mask whenever the pose bone selection changes. "
+            "Weights are indexed when enabled or when running Mask From Bones"
+        ),
+        default=False,
+        update=live_bones_changed
+    )
+    live_delay: FloatProperty(
+        name="Live Update Delay",
+        description="Seconds to wait for further selection changes before updating the mask",
+        default=0.15,
+        min=0.0,
+        soft_max=1.0,
+        subtype='TIME_ABSOLUTE'
+    )
+
+
 def menu_func(self, context):
     self.layout.operator(
         OBJECT_OT_weight_mask_mesh_from_bone.bl_idname)
+    self.layout.operator(
+        WEIGHTPAINT_OT_mask_geodesic.bl_idname)
     self.layout.operator(
         WEIGHTPAINT_OT_mask_shrink.bl_idname)
     self.layout.operator(
         WEIGHTPAINT_OT_mask_grow.bl_idname)
+    self.layout.menu(VIEW3D_MT_weight_mask_stack.bl_idname)
+    self.layout.prop(context.scene.wp_mask_props, "live_bones")
+
+
+stack_classes = (
+    WEIGHTPAINT_OT_mask_push,
+    WEIGHTPAINT_OT_mask_pop,
+    WEIGHTPAINT_OT_mask_swap,
+    WEIGHTPAINT_OT_mask_combine,
+    VIEW3D_MT_weight_mask_stack,
+)
 
 
 addon_keymaps = []
@@ -201,11 +722,18 @@ def remove_hotkeys():
 
 
 def register():
+    bpy.utils.register_class(PG_WPMaskProperties)
+    bpy.types.Scene.wp_mask_props = PointerProperty(type=PG_WPMaskProperties)
     bpy.utils.register_class(OBJECT_OT_weight_mask_mesh_from_bone)
-    bpy.types.VIEW3D_MT_paint_weight.append(menu_func)
 
     bpy.utils.register_class(WEIGHTPAINT_OT_mask_grow)
     bpy.utils.register_class(WEIGHTPAINT_OT_mask_shrink)
+    bpy.utils.register_class(WEIGHTPAINT_OT_mask_geodesic)
+    for cls in stack_classes:
+        bpy.utils.register_class(cls)
+
+    bpy.types.VIEW3D_MT_paint_weight.append(menu_func)
+    bpy.app.handlers.load_post.append(live_mask_load_post)
     
     add_hotkeys()
 
@@ -213,12 +741,30 @@ def register():
 def unregister():
     remove_hotkeys()
 
+    bpy.types.VIEW3D_MT_paint_weight.remove(menu_func)
+
+    for cls in reversed(stack_classes):
+        bpy.utils.unregister_class(cls)
+    bpy.utils.unregister_class(WEIGHTPAINT_OT_mask_geodesic)
     bpy.utils.unregister_class(WEIGHTPAINT_OT_mask_shrink)
     bpy.utils.unregister_class(WEIGHTPAINT_OT_mask_grow)
-
-    bpy.types.VIEW3D_MT_paint_weight.remove(menu_func)
     bpy.utils.unregister_class(OBJECT_OT_weight_mask_mesh_from_bone)
 
+    if live_mask_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(live_mask_load_post)
+    if live_mask_update in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(live_mask_update)
+    if bpy.app.timers.is_registered(apply_live_mask):
+        bpy.app.timers.unregister(apply_live_mask)
+    _live_state.update(key=None, pending=False)
+
+    del bpy.types.Scene.wp_mask_props
+    bpy.utils.unregister_class(PG_WPMaskProperties)
+
+    _topology_cache.clear()
+    _bone_index_cache.clear()
+    _mask_stacks.clear()
+
 
 if __name__ == "__main__":
     register()